@@ -12,6 +12,44 @@ DEFAULT_V_FRAMETYPES = []
 DEFAULT_FRAME_LENGTH = 64
 DEFAULT_SERVER = 'ldas-pcdev2.ligo.caltech.edu'
 DEFAULT_OUTDIR = '.'
+# keep SSH control connections open for this many seconds after last use
+SSH_CONTROL_PERSIST = 600
+MULTIPLEX_SSH = True
+DEFAULT_JOBS_PER_SERVER = 1
+# seconds between progress reports from parallel downloads
+PROGRESS_INTERVAL = 60
+# number of remote files to hash with a single remote ``sha256sum`` call
+REMOTE_HASH_BATCH_SIZE = 32
+# number of bytes to hash at a time when hashing local files
+LOCAL_HASH_CHUNK_SIZE = 2**23
+# rebuild cached listings of remote frame directories after this many seconds
+REMOTE_INDEX_TTL = 86400
+# number of bytes to read at a time while transferring frame files
+TRANSFER_CHUNK_SIZE = 2**20
+# maximum number of frames waiting between stages of a DownloadPipeline
+PIPELINE_DEPTH = 8
+# seconds to wait before retrying a failed frame; doubles with each failure
+RETRY_BACKOFF = 30
+RETRY_BACKOFF_MAX = 3600
+# how to reach the servers holding the frames; see ``TRANSPORTS``
+TRANSPORT = 'gsissh'
+# simulated per-operation latency (in seconds) and bandwidth (in bytes per
+# second, or None for unlimited) of the ``local`` transport
+LOCAL_LATENCY = 0.
+LOCAL_BANDWIDTH = None
+# pause downloads rather than leave less than this many GB free in the output
+# directory (on its filesystem, or under ``QUOTA_GB`` if that is set)
+MIN_FREE_GB = 10.
+QUOTA_GB = None
+# seconds between disk space checks while downloads are paused
+DISK_SPACE_POLL_INTERVAL = 60
+# seconds between updates of the ``--watch`` dashboard, and the window (in
+# seconds) over which it estimates download rates
+WATCH_INTERVAL = 10
+WATCH_RATE_WINDOW = 600
+# path to an index of frames downloaded by all jobs, used to link frames that
+# have already been downloaded elsewhere instead of downloading them again
+SHARED_INDEX = None
 _TARGETED_SEARCH_FRAMETYPE_DICT_CIT = {
     "H1_HOFT_C02":  "hoft_C02/H1",
     "L1_HOFT_C02":  "hoft_C02/L1",
@@ -62,10 +100,13 @@ if __name__ == "__main__":
         type=int,
         default=0,
         help="""
-            In the event of an error, retry an additional ``retries`` number of
-            times. By default, do not retry (i.e. ``retries = 0``). To keep
-            retrying an infinite number of times, specify any negative number.
-        """
+            If a frame fails to download, retry it an additional ``retries``
+            number of times. Failed frames are retried after all other frames
+            have been tried, waiting exponentially longer after each failure
+            (starting at {}s and capped at {}s). By default, do not retry
+            (i.e. ``retries = 0``). To keep retrying an infinite number of
+            times, specify any negative number.
+        """.format(RETRY_BACKOFF, RETRY_BACKOFF_MAX)
     )
     parser.add_argument(
         "-t",
@@ -96,6 +137,51 @@ if __name__ == "__main__":
             progress has been made on this job based on the files it finds.
         """
     )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="""
+            Don't bother downloading; instead, print download statistics for
+            ``--outdir`` from the timings recorded in the download manifest:
+            throughput per server, median and 95th percentile times for each
+            phase of downloading a frame, and time lost to failed attempts.
+        """
+    )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        nargs="*",
+        metavar="OUTDIR",
+        help="""
+            Don't bother downloading; instead, keep printing a dashboard
+            showing the progress, download rate, and ETA of the downloads into
+            each ``OUTDIR`` (DEFAULT: ``--outdir``) every ``--watch-interval``
+            seconds until interrupted. Only the records added to each download
+            manifest since the last update are read, so this is cheap enough
+            to leave running. The number of frames expected (needed for the
+            ETA) is taken from ``--start`` and ``--deltat`` if given, and
+            otherwise from the last download into each ``OUTDIR``.
+        """
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=WATCH_INTERVAL,
+        help="""
+            Seconds between updates of the ``--watch`` dashboard. DEFAULT: {}
+        """.format(WATCH_INTERVAL)
+    )
+    parser.add_argument(
+        "--find-corrupt",
+        action="store_true",
+        help="""
+            Don't bother downloading; instead, list the GWF files in
+            ``--outdir`` whose local and remote sha256 sums (as recorded in the
+            download manifest) are missing or don't match, e.g. due to
+            interrupted downloads, along with the time since each was last
+            modified.
+        """
+    )
     parser.add_argument(
         "-d",
         "--deltat",
@@ -114,6 +200,27 @@ if __name__ == "__main__":
             followed by a frame file download. DEFAULT: {}
             """.format(DEFAULT_SERVER)
     )
+    parser.add_argument(
+        "-S",
+        "--servers",
+        nargs="*",
+        help="""
+            Download from several servers at once, spreading frames across
+            them and moving frames away from servers that keep failing. If
+            given without any server names, use all of the CIT servers: {}.
+            Overrides ``--server``.
+            """.format(_TARGETED_SEARCH_SERVERS_CIT)
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs-per-server",
+        type=int,
+        default=DEFAULT_JOBS_PER_SERVER,
+        help="""
+            The number of frames to download from each server at once.
+            DEFAULT: {}
+            """.format(DEFAULT_JOBS_PER_SERVER)
+    )
     parser.add_argument(
         "-o",
         "--outdir",
@@ -157,6 +264,118 @@ if __name__ == "__main__":
             {}
             """.format(DEFAULT_V_FRAMETYPES)
     )
+    parser.add_argument(
+        "--min-free-space",
+        type=float,
+        default=MIN_FREE_GB,
+        metavar="GB",
+        help="""
+            Pause downloads whenever the next frame would leave less than this
+            many GB free in ``--outdir`` (or under ``--quota``), resuming once
+            space has been freed. DEFAULT: {}
+        """.format(MIN_FREE_GB)
+    )
+    parser.add_argument(
+        "--quota",
+        type=float,
+        metavar="GB",
+        help="""
+            The quota, in GB, for ``--outdir`` and everything under it, for
+            filesystems where the quota is smaller than the free space on the
+            filesystem. Existing files in ``--outdir`` count towards it.
+        """
+    )
+    parser.add_argument(
+        "--prioritize-triggers",
+        nargs="?",
+        const="",
+        metavar="TRIGGER_DIR",
+        help="""
+            Download the frames closest to GSTLAL trigger times first, so
+            that the most valuable data lands first if the download is cut
+            short. Trigger times are read from the names of the
+            ``gstlal-offline-<GPS time>_<FAR>`` event directories in
+            ``TRIGGER_DIR`` or, if no directory is given, taken to be the
+            midpoints of the requested time windows (as written by
+            ``geco_get_gstlal_timewindows.py``).
+        """
+    )
+    parser.add_argument(
+        "--shared-index",
+        metavar="INDEX_FILE",
+        help="""
+            A content index of frames downloaded by every job that uses the
+            same ``INDEX_FILE`` (keyed by remote path and sha256 sum). Before
+            transferring a frame, look it up in the index; if an intact copy of
+            the same remote file has already been downloaded into any output
+            directory, hardlink it (or reflink or copy it, if it is on another
+            filesystem) instead. Frames downloaded by this job are added to
+            the index.
+        """
+    )
+    parser.add_argument(
+        "--add-to-shared-index",
+        action="store_true",
+        help="""
+            Don't bother downloading; instead, add every intact frame already
+            downloaded into ``--outdir`` (according to its download manifest)
+            to ``--shared-index``.
+        """
+    )
+    parser.add_argument(
+        "--transport",
+        choices=["gsissh", "ssh", "local"],
+        default=TRANSPORT,
+        help="""
+            How to reach the servers holding the frames. ``gsissh`` and
+            ``ssh`` run commands on each ``--server`` over (GSI-)SSH.
+            ``local`` treats each ``--server`` as the root directory of a local
+            frame tree instead, which is useful for testing and benchmarking
+            the fetcher without access to a LIGO cluster (see
+            ``--local-latency``, ``--local-bandwidth``, and
+            ``--make-synthetic-frames``). DEFAULT: {}
+        """.format(TRANSPORT)
+    )
+    parser.add_argument(
+        "--local-latency",
+        type=float,
+        default=LOCAL_LATENCY,
+        help="""
+            Seconds to wait before each operation of the ``local`` transport,
+            simulating the round-trip time to a remote server. DEFAULT: {}
+        """.format(LOCAL_LATENCY)
+    )
+    parser.add_argument(
+        "--local-bandwidth",
+        type=float,
+        default=LOCAL_BANDWIDTH,
+        help="""
+            Maximum bytes per second per transfer for the ``local`` transport,
+            simulating a slow link. DEFAULT: unlimited
+        """
+    )
+    parser.add_argument(
+        "--make-synthetic-frames",
+        type=int,
+        metavar="BYTES",
+        help="""
+            Don't bother downloading; instead, fill the ``local`` transport's
+            frame tree (the directory given as ``--server``) with files of
+            random data, ``BYTES`` bytes long, for every frame that would have
+            been downloaded, so that the fetcher can be benchmarked against it.
+        """
+    )
+    parser.add_argument(
+        "--no-multiplex",
+        action="store_true",
+        help="""
+            Start a new SSH connection (with a full GSI handshake, for
+            ``gsissh``) for every remote command instead of running all remote
+            commands for a server over a single persistent, multiplexed SSH
+            control connection. Use this if the local ``ssh`` or ``gsissh``
+            does not support the ``ControlMaster`` option.
+        """
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -165,17 +384,35 @@ if __name__ == "__main__":
     )
     args = parser.parse_args()
     VERBOSE = args.verbose
-if VERBOSE:  # if verbose, print everything
-    _PIPE_ARGS = {"stdout": PIPE}
-else:
-    _PIPE_ARGS = {"stdout": PIPE, "stderr": PIPE}
-
-import filecmp
+    MULTIPLEX_SSH = not args.no_multiplex
+    TRANSPORT = args.transport
+    MIN_FREE_GB = args.min_free_space
+    SHARED_INDEX = args.shared_index
+    QUOTA_GB = args.quota
+    LOCAL_LATENCY = args.local_latency
+    LOCAL_BANDWIDTH = args.local_bandwidth
+
+import json
+import bisect
 import numpy as np
 import collections
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
 import os
+import atexit
+import tempfile
+import shutil
+import threading
+import glob
+import heapq
+import itertools
+import hashlib
+import mmap
+import abc
+try:
+    import Queue as queue
+except ImportError:
+    import queue
 
 
 class GWDataFindException(Exception):
@@ -183,7 +420,8 @@ class GWDataFindException(Exception):
 
 
 class GWDataDownloadException(Exception):
-    """An error thrown when ``gsiscp`` fails to download the desired data."""
+    """An error thrown when the remote file cannot be copied to the local
+    machine."""
 
 
 class GWRemoteSha256Exception(Exception):
@@ -191,7 +429,7 @@ class GWRemoteSha256Exception(Exception):
 
 
 class GWLocalSha256Exception(Exception):
-    """An error thrown when ``sha256sum`` fails locally."""
+    """An error thrown when a local file cannot be hashed."""
 
 
 class FileNameParsingError(Exception):
@@ -210,6 +448,44 @@ def time_since_file_modified(filename):
     return time.time() - os.path.getmtime(filename)
 
 
+def sha256_file(filename, chunk_size=LOCAL_HASH_CHUNK_SIZE):
+    """Get the hex sha256 sum of a local file without starting a subprocess,
+    hashing a memory map of the file ``chunk_size`` bytes at a time. The
+    chunks are views into the map rather than copies of it."""
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        # can't memory map an empty file
+        if size == 0:
+            return sha256.hexdigest()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = None
+        try:
+            try:
+                view = memoryview(mapped)
+            except TypeError:
+                # python 2 mmaps only support the old buffer interface
+                pass
+            for offset in range(0, size, chunk_size):
+                if view is None:
+                    sha256.update(buffer(mapped, offset, chunk_size))
+                else:
+                    sha256.update(view[offset:offset+chunk_size])
+        finally:
+            # the map can't be closed while a view of it exists
+            if view is not None:
+                view.release()
+            mapped.close()
+    return sha256.hexdigest()
+
+
+def alert(*messages):
+    """Like ``complain``, but always write the message to stderr, even if
+    not running in verbose mode."""
+    msg = '\n'.join([format(m) for m in messages])
+    sys.stderr.write(_COMPLAINT.format(datetime.now().isoformat(), msg))
+
+
 def complain(*messages):
     """Write a message to stderr if running in interactive mode or if the
     ``--verbose`` flag is set. Otherwise, throw away the message. If multiple
@@ -220,14 +496,1058 @@ def complain(*messages):
         sys.stderr.write(formatted_message)
 
 
+class SSHSession(object):
+    """A long-lived SSH control connection to a single server. All remote
+    commands and file transfers for that server are multiplexed over the
+    control connection's socket, so that only the first one pays for the
+    (GSI) handshake. ``ssh`` is the SSH command to use. Use ``SSHSession.get``
+    to get the shared session for a server; all sessions are closed when the
+    program exits. If ``MULTIPLEX_SSH`` is ``False``, every command starts a
+    new connection as usual."""
+
+    SSH = 'gsissh'
+    _sessions = dict()
+    _sessions_lock = threading.Lock()
+    _control_dir = None
+
+    def __init__(self, server, ssh=SSH, persist=SSH_CONTROL_PERSIST):
+        self.server = server
+        self.ssh = ssh
+        self.persist = persist
+        self.is_open = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, server, ssh=SSH):
+        """Get the shared ``SSHSession`` for ``server`` using the ``ssh``
+        command, creating it if necessary."""
+        with cls._sessions_lock:
+            if not (ssh, server) in cls._sessions:
+                cls._sessions[(ssh, server)] = cls(server, ssh)
+            return cls._sessions[(ssh, server)]
+
+    @classmethod
+    def close_all(cls):
+        """Close all open control connections and remove their sockets."""
+        with cls._sessions_lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+            if cls._control_dir is not None:
+                shutil.rmtree(cls._control_dir, ignore_errors=True)
+                cls._control_dir = None
+
+    @property
+    def control_path(self):
+        """The path to the control socket for this server. Sockets live in a
+        short temporary directory since socket paths have a length limit."""
+        cls = type(self)
+        if cls._control_dir is None:
+            cls._control_dir = tempfile.mkdtemp(prefix='geco-ssh-')
+        return os.path.join(cls._control_dir, '%r@%h:%p')
+
+    def options(self):
+        """Get the command line options telling ``ssh`` to use the
+        control connection, falling back to a fresh connection if the control
+        connection has died."""
+        if not MULTIPLEX_SSH:
+            return []
+        return ['-o', 'ControlMaster=auto',
+                '-o', 'ControlPath={}'.format(self.control_path),
+                '-o', 'ControlPersist={}'.format(self.persist)]
+
+    def open(self):
+        """Start the control connection in the background if it is not
+        already running."""
+        with self._lock:
+            if self.is_open or not MULTIPLEX_SSH:
+                return
+            cmd = [self.ssh, '-M', '-N', '-f'] + self.options() + [self.server]
+            complain("Opening SSH control connection:", cmd)
+            # the backgrounded master keeps its output streams open, so don't
+            # wait on pipes; just wait for the foreground process to exit.
+            with open(os.devnull, 'w') as devnull:
+                retval = Popen(cmd, stdout=devnull, stderr=devnull).wait()
+            if retval != 0:
+                complain("Could not open control connection to {}; commands "
+                         "will start their own.".format(self.server))
+            self.is_open = True
+
+    def close(self):
+        """Tell the control connection to exit."""
+        with self._lock:
+            if not self.is_open or not MULTIPLEX_SSH:
+                return
+            cmd = [self.ssh, '-O', 'exit'] + self.options() + [self.server]
+            proc = Popen(cmd, stdout=PIPE, stderr=PIPE)
+            proc.communicate()
+            self.is_open = False
+
+    def ssh_command(self, cmd):
+        """Get the full argument list for running ``cmd`` on the server."""
+        self.open()
+        return [self.ssh] + self.options() + [self.server, cmd]
+
+    def run(self, cmd, exception=Exception, check=True):
+        """Run ``cmd`` on the server, returning a tuple containing (stdout,
+        stderr) and throwing the specified ``exception`` type in the event of
+        a nonzero return code (unless ``check`` is ``False``)."""
+        proc = Popen(self.ssh_command(cmd), stdout=PIPE, stderr=PIPE,
+                     universal_newlines=True)
+        res, err = proc.communicate()
+        complain("RETVAL:", proc.returncode, "STDOUT:", res, "STDERR:", err)
+        if check and proc.returncode != 0:
+            raise exception("Something went wrong: {}".format(err))
+        return (res, err)
+
+
+atexit.register(SSHSession.close_all)
+
+
+# a base class for abstract classes that works on both python 2 and 3, where
+# ``__metaclass__`` is ignored
+_ABC = abc.ABCMeta('_ABC', (object,), {})
+
+
+class Transport(_ABC):
+    """The operations that the fetcher needs to perform on the server holding
+    the frame files: finding frames with ``find``, listing directories with
+    ``list``, checking files with ``stat`` and ``hash``, and copying them with
+    ``transfer``. Subclasses implement these for a particular way of reaching
+    the server; see ``TRANSPORTS``. Use ``Transport.get`` to get the shared
+    transport for a server."""
+
+    _transports = dict()
+    _transports_lock = threading.Lock()
+
+    def __init__(self, server):
+        self.server = server
+
+    @staticmethod
+    def get(server):
+        """Get the shared transport for ``server`` of the kind selected by
+        ``TRANSPORT``, creating it if necessary."""
+        with Transport._transports_lock:
+            key = (TRANSPORT, server)
+            if not key in Transport._transports:
+                Transport._transports[key] = TRANSPORTS[TRANSPORT](server)
+            return Transport._transports[key]
+
+    @abc.abstractmethod
+    def find(self, detector, frametype, start, end):
+        """Get a list of the full remote paths of frames of the given
+        ``detector`` and ``frametype`` overlapping the GPS times from
+        ``start`` to ``end``, as ``gw_data_find`` would. Raises a
+        ``GWDataFindException`` if the search fails."""
+
+    @abc.abstractmethod
+    def list(self, pattern):
+        """Get a list of the full remote paths of all frame files in or under
+        the directories matching the shell glob ``pattern``. Unreadable
+        directories are skipped. Raises a ``GWDataFindException`` if the
+        listing fails."""
+
+    @abc.abstractmethod
+    def stat(self, path):
+        """Get a ``(size, mtime)`` tuple for the remote file at ``path``.
+        Raises a ``GWDataDownloadException`` if it can't be read."""
+
+    @abc.abstractmethod
+    def hash(self, paths):
+        """Get a dictionary mapping each remote file in ``paths`` to its sha256
+        sum. Files that could not be hashed are left out, unless none of them
+        could be, in which case a ``GWRemoteSha256Exception`` describing the
+        error is raised."""
+
+    @abc.abstractmethod
+    def transfer(self, path, offset=0):
+        """Iterate through chunks of the contents of the remote file at
+        ``path``, starting ``offset`` bytes in. Raises a
+        ``GWDataDownloadException`` if the transfer fails."""
+
+
+class SSHTransport(Transport):
+    """Reach the server over plain SSH, running standard command line tools
+    (and ``gw_data_find``) on it through a shared ``SSHSession``."""
+
+    SSH = 'ssh'
+
+    _GW_DATA_FIND_QUERY_FMT = """gw_data_find \\
+        --observatory {} \\
+        --type {} \\
+        --gps-start-time {} \\
+        --gps-end-time {} \\
+        --url-type file
+    """
+
+    # ``find`` exits with status 1 if any directory can't be read (or the
+    # pattern matches nothing), but still lists everything else; treat that
+    # as success so that only real failures (e.g. of the connection) raise.
+    _LIST_FMT = "find {} -name '*.gwf' || test $? -eq 1"
+
+    _STAT_FMT = "stat -c '%s %Y' '{}'"
+
+    # print the file starting at a given 1-indexed byte offset
+    _TRANSFER_FMT = "tail -c +{} '{}'"
+
+    @property
+    def session(self):
+        """The shared ``SSHSession`` for this server."""
+        return SSHSession.get(self.server, self.SSH)
+
+    def find(self, detector, frametype, start, end):
+        cmd = self._GW_DATA_FIND_QUERY_FMT.format(detector, frametype, start,
+                                                  end)
+        res, err = self.session.run(cmd, GWDataFindException)
+        return [RemoteFileInfo(l).fullpath for l in res.splitlines()
+                if l.strip()]
+
+    def list(self, pattern):
+        res, err = self.session.run(self._LIST_FMT.format(pattern),
+                                    GWDataFindException)
+        return [l.strip() for l in res.splitlines() if l.strip()]
+
+    def stat(self, path):
+        res, err = self.session.run(self._STAT_FMT.format(path),
+                                    GWDataDownloadException)
+        size, mtime = res.split()
+        return (int(size), int(mtime))
+
+    def hash(self, paths):
+        cmd = ' '.join(['sha256sum'] + ["'{}'".format(p) for p in paths])
+        # sha256sum fails if *any* file can't be read, but still hashes the
+        # rest, so parse whatever it managed to hash.
+        res, err = self.session.run(cmd, GWRemoteSha256Exception, check=False)
+        sums = dict()
+        for line in res.splitlines():
+            try:
+                sha256, path = line.split(None, 1)
+            except ValueError:
+                continue
+            # binary mode output is marked with a leading asterisk
+            sums[path.lstrip('*')] = sha256
+        if paths and not sums:
+            raise GWRemoteSha256Exception("Something went wrong: {}".format(
+                err))
+        if len(sums) < len(paths):
+            complain("sha256sum on {} failed for some files. STDERR:".format(
+                self.server), err)
+        return sums
+
+    def transfer(self, path, offset=0):
+        cmd = self.session.ssh_command(self._TRANSFER_FMT.format(offset + 1,
+                                                                 path))
+        complain("Running command in subprocess:", cmd)
+        # stderr goes to a file so that it can't fill up and block the pipe
+        with tempfile.TemporaryFile() as errfile:
+            proc = Popen(cmd, stdout=PIPE, stderr=errfile)
+            try:
+                read = lambda: proc.stdout.read(TRANSFER_CHUNK_SIZE)
+                for chunk in iter(read, b''):
+                    yield chunk
+                retval = proc.wait()
+            finally:
+                # don't leave the transfer running if we stop reading early
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+            errfile.seek(0)
+            err = errfile.read()
+        complain("RETVAL:", retval, "STDERR:", err)
+        if retval != 0:
+            errtime = datetime.utcnow().isoformat()
+            errfmt = "DOWNLOAD ERROR at {}. STDERR: \n{}\n"
+            raise GWDataDownloadException(errfmt.format(errtime, err))
+
+
+class GSISSHTransport(SSHTransport):
+    """Reach the server over GSI-SSH (the usual way into LIGO clusters)."""
+
+    SSH = 'gsissh'
+
+
+class LocalTransport(Transport):
+    """Serve frames from a directory tree on the local filesystem, treating
+    the ``server`` name as the root of the tree. Every operation is delayed by
+    ``latency`` seconds and transfers are throttled to ``bandwidth`` bytes per
+    second (if not ``None``) to simulate a remote server, so that throughput
+    changes to the fetcher can be measured reproducibly on any machine. The
+    defaults are taken from ``LOCAL_LATENCY`` and ``LOCAL_BANDWIDTH``. Use
+    ``make_synthetic_frames`` to populate the tree."""
+
+    def __init__(self, server, latency=None, bandwidth=None):
+        super(LocalTransport, self).__init__(server)
+        self.latency = LOCAL_LATENCY if latency is None else latency
+        self.bandwidth = LOCAL_BANDWIDTH if bandwidth is None else bandwidth
+        self._frames = None
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _walk(self, top):
+        """Get the full paths of all frame files in or under ``top``."""
+        paths = list()
+        for dirpath, dirnames, filenames in os.walk(top):
+            paths += [os.path.join(dirpath, f) for f in filenames
+                      if f.endswith('.gwf')]
+        return paths
+
+    def _frame_index(self):
+        """Get a dictionary mapping ``(detector, frametype)`` to a sorted list
+        of ``(start, duration, path)`` tuples for every frame in the tree,
+        building it the first time it is needed."""
+        with self._lock:
+            if self._frames is None:
+                self._frames = collections.defaultdict(list)
+                for path in self._walk(self.server):
+                    parts = os.path.basename(path).split('.')[0].split('-')
+                    try:
+                        detector, frametype, start, duration = parts
+                        key = (detector, frametype)
+                        frame = (int(start), int(duration), path)
+                    except ValueError:
+                        continue
+                    self._frames[key].append(frame)
+                for frames in self._frames.values():
+                    frames.sort()
+            return self._frames
+
+    def find(self, detector, frametype, start, end):
+        self._wait()
+        frames = self._frame_index().get((detector, frametype), [])
+        return [path for fstart, duration, path in frames
+                if fstart <= int(end) and int(start) < fstart + duration]
+
+    def list(self, pattern):
+        self._wait()
+        return sum([self._walk(d) for d in sorted(glob.glob(pattern))], [])
+
+    def stat(self, path):
+        self._wait()
+        try:
+            info = os.stat(path)
+        except OSError as e:
+            raise GWDataDownloadException("Something went wrong: {}".format(e))
+        return (info.st_size, int(info.st_mtime))
+
+    def hash(self, paths):
+        self._wait()
+        sums = dict()
+        errors = list()
+        for path in paths:
+            try:
+                sums[path] = sha256_file(path)
+            except (IOError, OSError) as e:
+                complain("Could not hash {}:".format(path), e)
+                errors.append(str(e))
+        if paths and not sums:
+            raise GWRemoteSha256Exception("Something went wrong: {}".format(
+                '\n'.join(errors)))
+        return sums
+
+    def transfer(self, path, offset=0):
+        self._wait()
+        try:
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                started = time.time()
+                sent = 0
+                for chunk in iter(lambda: f.read(TRANSFER_CHUNK_SIZE), b''):
+                    yield chunk
+                    sent += len(chunk)
+                    if self.bandwidth:
+                        elapsed = time.time() - started
+                        behind = sent / self.bandwidth - elapsed
+                        if behind > 0:
+                            time.sleep(behind)
+        except (IOError, OSError) as e:
+            errtime = datetime.utcnow().isoformat()
+            errfmt = "DOWNLOAD ERROR at {}. ERROR: \n{}\n"
+            raise GWDataDownloadException(errfmt.format(errtime, e))
+
+
+# the available values of ``TRANSPORT``
+TRANSPORTS = {
+    'gsissh': GSISSHTransport,
+    'ssh': SSHTransport,
+    'local': LocalTransport
+}
+
+
+class FrameManifest(object):
+    """An append-only JSONL log, one per output directory, of everything we
+    know about each downloaded frame file: its remote URL, remote and local
+    sha256 sums, the query that produced it, and its error history. This
+    replaces the five ``.{name}.{type}.txt`` rider files per frame that were
+    used before; if no manifest exists yet, any such rider files in the output
+    directory are imported into a new one.
+
+    Each line is a JSON object with ``file`` (the local frame filename),
+    ``field``, ``value``, and ``time`` keys. The whole manifest is read once
+    into an in-memory index; later records for a field replace earlier ones,
+    except for ``error_msg``, whose values are all kept in order. Use
+    ``FrameManifest.get`` to get the shared manifest for a directory."""
+
+    FILENAME = '.geco_fetch_frame_files.manifest.jsonl'
+    # fields that used to be stored in rider files
+    RIDER_TYPES = [
+        'remote_sha256',
+        'local_sha256',
+        'query_repr',
+        'error_msg',
+        'remote_url'
+    ]
+    RIDER_FORMAT = '.{}.{}.txt'
+    # fields whose values are appended to a list rather than replaced
+    HISTORY_FIELDS = ('error_msg', 'failed_attempt')
+    _manifests = dict()
+    _manifests_lock = threading.Lock()
+
+    def __init__(self, outdir):
+        self.outdir = outdir
+        self.path = os.path.join(outdir, self.FILENAME)
+        self.index = collections.defaultdict(dict)
+        self._lock = threading.Lock()
+        if os.path.isfile(self.path):
+            self._load()
+        else:
+            self.import_riders()
+
+    @classmethod
+    def get(cls, outdir):
+        """Get the shared ``FrameManifest`` for ``outdir``, loading it the
+        first time it is requested."""
+        key = os.path.abspath(outdir)
+        with cls._manifests_lock:
+            if not key in cls._manifests:
+                cls._manifests[key] = cls(outdir)
+            return cls._manifests[key]
+
+    def _index_record(self, record):
+        entry = self.index[record['file']]
+        if record['field'] in self.HISTORY_FIELDS:
+            entry.setdefault(record['field'], []).append(record['value'])
+        else:
+            entry[record['field']] = record['value']
+
+    def _load(self):
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    self._index_record(json.loads(line))
+                except ValueError:
+                    # a write might have been interrupted
+                    complain("Skipping malformed manifest line:", line)
+
+    def record(self, filename, field, value):
+        """Append a record setting ``field`` to ``value`` for the local frame
+        file ``filename``. Values of ``HISTORY_FIELDS`` (e.g. error messages)
+        are appended to that file's history rather than replacing it."""
+        record = {
+            'file': filename,
+            'field': field,
+            'value': value,
+            'time': datetime.utcnow().isoformat()
+        }
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+            self._index_record(record)
+
+    def lookup(self, filename):
+        """Get a dictionary of everything recorded for the local frame file
+        ``filename``. ``HISTORY_FIELDS``, if present, are lists of values."""
+        with self._lock:
+            return dict(self.index.get(filename, {}))
+
+    def entries(self):
+        """Get a dictionary mapping every local frame file in the manifest to
+        everything recorded for it (see ``lookup``)."""
+        with self._lock:
+            return {f: dict(e) for f, e in self.index.items()}
+
+    def import_riders(self):
+        """Import the contents of any old-style rider files in the output
+        directory into this manifest. Run automatically when a manifest is
+        created; the rider files are left in place."""
+        if not os.path.isdir(self.outdir):
+            return
+        suffixes = [(self.RIDER_FORMAT.format('', t)[1:], t)
+                    for t in self.RIDER_TYPES]
+        imported = 0
+        for name in sorted(os.listdir(self.outdir)):
+            if not name.startswith('.'):
+                continue
+            for suffix, field in suffixes:
+                if not name.endswith(suffix):
+                    continue
+                filename = name[1:-len(suffix)]
+                with open(os.path.join(self.outdir, name)) as f:
+                    value = f.read()
+                self.record(filename, field, value)
+                imported += 1
+                break
+        if imported:
+            complain("Imported {} rider files into {}".format(imported,
+                                                             self.path))
+
+    def corrupt_files(self, filenames):
+        """Get the subset of local ``filenames`` whose local and remote sha256
+        sums are missing or do not match."""
+        corrupt = list()
+        for filename in filenames:
+            entry = self.lookup(filename)
+            local = entry.get('local_sha256')
+            if local is None or local != entry.get('remote_sha256'):
+                corrupt.append(filename)
+        return corrupt
+
+
+class DiskSpaceGuard(object):
+    """Keep downloads from filling up the output directory's filesystem or
+    exceeding its quota. Before each transfer, ``reserve`` the number of bytes
+    it will write; if this would leave less than ``min_free`` bytes free on
+    the filesystem (as reported by ``statvfs``) or under ``quota`` (if given,
+    counting everything already in ``outdir``), the transfer is paused, and
+    an alert printed, until enough space has been freed. ``release`` the
+    reservation once the transfer is over. If the ``path`` being written is
+    given, only the part of a reservation that hasn't been written to it yet
+    is held back, since ``statvfs`` already counts what has. Usage of the
+    quota is counted again whenever a transfer would be paused, and on every
+    poll while it is, so that deleting files frees space. The defaults are
+    taken from ``MIN_FREE_GB`` and ``QUOTA_GB``. Use ``DiskSpaceGuard.get``
+    to get the shared guard for an output directory."""
+
+    _guards = dict()
+    _guards_lock = threading.Lock()
+
+    def __init__(self, outdir, min_free=None, quota=None):
+        self.outdir = outdir
+        self.min_free = MIN_FREE_GB * 1e9 if min_free is None else min_free
+        if quota is None and QUOTA_GB is not None:
+            quota = QUOTA_GB * 1e9
+        self.quota = quota
+        self.reserved = 0
+        self.used = None
+        self._writing = dict()
+        self.paused = False
+        self._condition = threading.Condition()
+
+    @classmethod
+    def get(cls, outdir):
+        """Get the shared ``DiskSpaceGuard`` for ``outdir``."""
+        key = os.path.abspath(outdir)
+        with cls._guards_lock:
+            if not key in cls._guards:
+                cls._guards[key] = cls(outdir)
+            return cls._guards[key]
+
+    def _used(self):
+        """The number of bytes used in ``outdir``, counted when it is needed
+        and kept up to date by ``release`` after that. Of a file still being
+        written to, only the bytes before its reserved ``offset`` count, since
+        the rest are counted separately until they are released."""
+        if self.used is None:
+            self.used = 0
+            writing = dict((os.path.abspath(path), offset)
+                           for path, (offset, _) in self._writing.items())
+            for dirpath, dirnames, filenames in os.walk(self.outdir):
+                for filename in filenames:
+                    try:
+                        path = os.path.abspath(os.path.join(dirpath,
+                                                            filename))
+                        size = os.path.getsize(path)
+                    except OSError:
+                        continue
+                    if path in writing:
+                        size = min(size, writing[path])
+                    self.used += size
+        return self.used
+
+    def _short_of_space(self, nbytes):
+        """Would reserving ``nbytes`` more leave less than ``min_free``
+        bytes?"""
+        return (self.available() - (self.reserved - self._written()) -
+                nbytes < self.min_free)
+
+    def available(self):
+        """The number of bytes that can be written to ``outdir``, ignoring
+        reservations."""
+        stat = os.statvfs(self.outdir)
+        available = stat.f_bavail * stat.f_frsize
+        if self.quota is not None:
+            available = min(available, self.quota - self._used() -
+                            self._written())
+        return available
+
+    def _written(self):
+        """The number of reserved bytes already written to the files given
+        to ``reserve``, which ``statvfs`` already counts but ``used`` won't
+        until they are released."""
+        written = 0
+        for path, (offset, nbytes) in list(self._writing.items()):
+            try:
+                written += min(max(os.path.getsize(path) - offset, 0), nbytes)
+            except OSError:
+                pass
+        return written
+
+    def reserve(self, nbytes, path=None, offset=0):
+        """Wait until ``nbytes`` can be written while leaving ``min_free``
+        bytes free, then reserve them. If given, ``path`` is the file that
+        they will be written to, starting at byte ``offset``."""
+        with self._condition:
+            while self._short_of_space(nbytes):
+                # files might have been deleted or replaced since ``used``
+                # was counted, so count it again before (and while) waiting
+                self.used = None
+                if not self._short_of_space(nbytes):
+                    break
+                if not self.paused:
+                    self.paused = True
+                    alert("Less than {:.1f} GB would be left in {}; pausing "
+                          "downloads until space is freed.".format(
+                              self.min_free / 1e9, self.outdir))
+                self._condition.wait(DISK_SPACE_POLL_INTERVAL)
+            if self.paused:
+                self.paused = False
+                alert("Space freed in {}; resuming downloads.".format(
+                    self.outdir))
+            self.reserved += nbytes
+            if path is not None:
+                self._writing[path] = (offset, nbytes)
+
+    def release(self, nbytes, written, path=None):
+        """Release a reservation of ``nbytes`` (to be written to ``path``, if
+        given) made with ``reserve`` once ``written`` bytes have actually been
+        written."""
+        with self._condition:
+            self.reserved -= nbytes
+            self._writing.pop(path, None)
+            if self.used is not None:
+                self.used += written
+            self._condition.notify_all()
+
+
+class SharedFrameIndex(object):
+    """An index of frame files downloaded into any output directory, shared
+    between jobs through a JSON-lines file at ``path`` that every job appends
+    to, so that a frame only needs to be downloaded once. Each record holds
+    the ``remote_path`` and ``sha256`` sum of a frame, the ``local_path`` of
+    an intact copy, its ``size``, and (if known) the remote file's
+    ``remote_stat`` (size and modification time) when it was downloaded.
+    Records added by other jobs are picked up before each lookup. Use
+    ``SharedFrameIndex.get`` to get the shared index selected with
+    ``SHARED_INDEX``."""
+
+    _indices = dict()
+    _indices_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self.records = collections.defaultdict(list)
+        self.offset = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        """Get the shared index at ``SHARED_INDEX``, or ``None`` if no shared
+        index is being used."""
+        if SHARED_INDEX is None:
+            return None
+        key = os.path.abspath(SHARED_INDEX)
+        with cls._indices_lock:
+            if not key in cls._indices:
+                cls._indices[key] = cls(SHARED_INDEX)
+            return cls._indices[key]
+
+    def _update(self):
+        """Read records appended since the last update."""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size <= self.offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        # only read whole lines; a partial line is picked up next time
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        for line in data[:end].splitlines():
+            try:
+                record = json.loads(line.decode('utf-8'))
+                self.records[record['remote_path']].append(record)
+            except (ValueError, KeyError):
+                complain("Skipping malformed shared index line:", line)
+
+    def add(self, remote_path, sha256, local_path, remote_stat=None):
+        """Record that ``local_path`` is an intact copy of ``remote_path``,
+        whose sha256 sum is ``sha256``."""
+        record = {
+            'remote_path': remote_path,
+            'sha256': sha256,
+            'local_path': os.path.abspath(local_path),
+            'size': os.path.getsize(local_path),
+            'remote_stat': remote_stat
+        }
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+
+    def candidates(self, remote_path):
+        """Get the records for local copies of ``remote_path`` that still
+        exist and have the expected size, newest first."""
+        with self._lock:
+            self._update()
+            records = list(reversed(self.records.get(remote_path, [])))
+        return [r for r in records if os.path.isfile(r['local_path']) and
+                os.path.getsize(r['local_path']) == r['size']]
+
+
+def link_or_copy(source, dest, guard=None):
+    """Put a copy of ``source`` at ``dest`` using as little disk space as
+    possible: a hardlink if possible, otherwise a reflink (on filesystems that
+    support copy-on-write), and otherwise a plain copy. A reflink or copy is
+    written to a partial file first, after reserving space for it with
+    ``guard`` (a ``DiskSpaceGuard``, if given), and only renamed to ``dest``
+    once it is complete. Returns the method used and the sha256 sum of the
+    copy, which is ``None`` for a hardlink since that is the same file as
+    ``source``. Raises a ``GWDataDownloadException`` if the copy ends up the
+    wrong size."""
+    try:
+        os.link(source, dest)
+        return 'hardlink', None
+    except OSError as e:
+        complain("Could not hardlink {} to {}:".format(source, dest), e)
+    part = dest + GWFrameQuery.PARTIAL_SUFFIX
+    size = os.path.getsize(source)
+    if guard is not None:
+        guard.reserve(size, part)
+    try:
+        with open(os.devnull, 'w') as devnull:
+            cmd = ['cp', '--reflink=always', source, part]
+            reflinked = Popen(cmd, stdout=devnull, stderr=devnull).wait() == 0
+        if reflinked:
+            method = 'reflink'
+            sha256 = sha256_file(part)
+        else:
+            method = 'copy'
+            hasher = hashlib.sha256()
+            with open(source, 'rb') as infile:
+                with open(part, 'wb') as outfile:
+                    for chunk in iter(lambda: infile.read(TRANSFER_CHUNK_SIZE),
+                                      b''):
+                        outfile.write(chunk)
+                        hasher.update(chunk)
+            sha256 = hasher.hexdigest()
+        local_size = os.path.getsize(part)
+        if local_size != size:
+            raise GWDataDownloadException(
+                "Copy of {} is {} bytes instead of {}.".format(
+                    source, local_size, size))
+        os.rename(part, dest)
+    except Exception as e:
+        if os.path.isfile(part):
+            os.remove(part)
+        raise e
+    finally:
+        if guard is not None:
+            guard.release(size, size if os.path.isfile(dest) else 0, part)
+    return method, sha256
+
+
+def add_to_shared_index(outdir):
+    """Add every intact frame in ``outdir`` (i.e. with matching local and
+    remote sha256 sums in its manifest) to the shared index."""
+    index = SharedFrameIndex.get()
+    if index is None:
+        raise ValueError("Must specify a ``--shared-index``.")
+    added = 0
+    for filename, entry in sorted(FrameManifest.get(outdir).entries().items()):
+        path = os.path.join(outdir, filename)
+        sha256 = entry.get('local_sha256')
+        if (sha256 is None or sha256 != entry.get('remote_sha256') or
+                not 'remote_url' in entry or not os.path.isfile(path)):
+            continue
+        index.add(RemoteFileInfo(entry['remote_url']).fullpath, sha256, path)
+        added += 1
+    complain("Added {} frames from {} to {}.".format(added, outdir,
+                                                      index.path))
+
+
+class ManifestWatcher(object):
+    """Follow the ``FrameManifest`` in ``outdir`` as it grows, reading only the
+    records appended since the last ``update`` and keeping running totals of
+    finished frames, bytes downloaded and failed attempts, along with recent
+    completion times for estimating the download rate. If ``total`` (the
+    number of frames expected) is given, or was saved in ``outdir`` by the
+    last download into it (see ``save_total``), an ETA can be estimated as
+    well."""
+
+    TOTAL_FILENAME = '.geco_fetch_frame_files.total.json'
+
+    def __init__(self, outdir, total=None):
+        self.outdir = outdir
+        self.path = os.path.join(outdir, FrameManifest.FILENAME)
+        self.total_path = os.path.join(outdir, self.TOTAL_FILENAME)
+        self.total = total
+        self.fixed_total = total is not None
+        self.total_mtime = None
+        self.reset()
+
+    @classmethod
+    def save_total(cls, outdir, total):
+        """Save ``total``, the number of frames a download into ``outdir`` is
+        expected to produce, for watchers that weren't told how many to
+        expect."""
+        path = os.path.join(outdir, cls.TOTAL_FILENAME)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'total': total}, f)
+        os.rename(path + '.tmp', path)
+
+    def _update_total(self):
+        if self.fixed_total:
+            return
+        try:
+            mtime = os.path.getmtime(self.total_path)
+            if mtime != self.total_mtime:
+                with open(self.total_path) as f:
+                    self.total = json.load(f)['total']
+                self.total_mtime = mtime
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+
+    def reset(self):
+        """Forget everything read from the manifest so far, so that the next
+        ``update`` reads it from the start."""
+        self.offset = 0
+        self.sums = collections.defaultdict(dict)
+        self.done = set()
+        self.nbytes = 0
+        self.failures = 0
+        self.finish_times = collections.deque()
+        self._partial_line = b''
+
+    def update(self):
+        """Read any records appended to the manifest since the last update.
+        Does nothing but a ``stat`` of the manifest (and of the saved total)
+        if nothing has been appended."""
+        self._update_total()
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size < self.offset:
+            # the manifest was replaced; start over
+            self.reset()
+        if size == self.offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            data = self._partial_line + f.read(size - self.offset)
+        self.offset = size
+        lines = data.split(b'\n')
+        # the last line might still be being written
+        self._partial_line = lines.pop()
+        for line in lines:
+            try:
+                self._add(json.loads(line.decode('utf-8')))
+            except (ValueError, KeyError):
+                pass
+
+    def _add(self, record):
+        field = record['field']
+        filename = record['file']
+        if field in ('local_sha256', 'remote_sha256'):
+            sums = self.sums[filename]
+            sums[field] = record['value']
+            if (sums.get('local_sha256') is not None and
+                    sums.get('local_sha256') == sums.get('remote_sha256')):
+                if not filename in self.done:
+                    self.done.add(filename)
+                    self.finish_times.append(_utc_timestamp(record['time']))
+            else:
+                self.done.discard(filename)
+        elif field == 'timing':
+            self.nbytes += record['value'].get('bytes', 0)
+        elif field == 'failed_attempt':
+            self.failures += 1
+
+    def rate(self, window=WATCH_RATE_WINDOW):
+        """Estimate the number of frames finished per second over the last
+        ``window`` seconds."""
+        now = _utc_timestamp()
+        while self.finish_times and self.finish_times[0] < now - window:
+            self.finish_times.popleft()
+        return len(self.finish_times) / float(window)
+
+    def summary(self):
+        """Get a one-line summary of the progress of this directory."""
+        rate = self.rate()
+        if self.total is None:
+            done, eta = str(len(self.done)), ''
+        else:
+            done = '{}/{}'.format(len(self.done), self.total)
+            remaining = self.total - len(self.done)
+            if remaining <= 0:
+                eta = ', ETA: done'
+            elif rate == 0:
+                eta = ', ETA: unknown'
+            else:
+                eta = ', ETA: {}'.format(timedelta(seconds=int(remaining /
+                                                               rate)))
+        return ('{}: {} frames ({:.2f} GB), {:.2f} frames/min, {} failed '
+                'attempts{}'.format(self.outdir, done, self.nbytes / 1e9,
+                                    rate * 60, self.failures, eta))
+
+
+def _utc_timestamp(isotime=None):
+    """Convert an ISO-format UTC time, as recorded in the manifest, to a UNIX
+    timestamp, or get the current UNIX timestamp if ``isotime`` is
+    ``None``."""
+    if isotime is None:
+        return time.time()
+    fmt = '%Y-%m-%dT%H:%M:%S.%f' if '.' in isotime else '%Y-%m-%dT%H:%M:%S'
+    return (datetime.strptime(isotime, fmt) -
+            datetime(1970, 1, 1)).total_seconds()
+
+
+def watch(outdirs, interval=WATCH_INTERVAL, total=None):
+    """Print a dashboard summarizing the progress of the downloads into each
+    of ``outdirs`` (see ``ManifestWatcher``) every ``interval`` seconds until
+    interrupted."""
+    watchers = [ManifestWatcher(outdir, total) for outdir in outdirs]
+    while True:
+        lines = [datetime.now().strftime('%Y-%m-%d %H:%M:%S')]
+        for watcher in watchers:
+            watcher.update()
+            lines.append(watcher.summary())
+        if sys.stdout.isatty():
+            # redraw in place
+            sys.stdout.write('\033[2J\033[H')
+        print('\n'.join(lines))
+        sys.stdout.flush()
+        time.sleep(interval)
+
+
+class RemoteDirectoryIndex(object):
+    """A cached listing of all frame files under a remote directory (one of
+    the ``_TARGETED_SEARCH_DIRECTORIES``), used to look up frames that
+    ``gw_data_find`` could not find with a dictionary lookup instead of a full
+    recursive listing of the remote directory for every missing frame.
+
+    The listing is built with a single ``Transport.list`` and cached as JSON in
+    ``cachedir``; it is rebuilt once it is older than ``REMOTE_INDEX_TTL``
+    seconds. When a lookup misses, only the subdirectory that should contain
+    the frame (e.g. ``H-H1_R-11869`` for ``H-H1_R-1186959360-64.gwf``) is
+    relisted, at most once per subdirectory. Use ``RemoteDirectoryIndex.get``
+    to get the shared index for a directory and server."""
+
+    CACHE_FORMAT = '.geco_fetch_frame_files.index.{}.{}.json'
+    # frames are stored in subdirectories named after their frametype and
+    # the first five digits of their GPS start times
+    _SUBDIR_GPS_DIGITS = 5
+    _SUBDIR_PATTERN_FMT = "{}/*-{}"
+    _indices = dict()
+    _indices_lock = threading.Lock()
+
+    def __init__(self, searchdir, server, cachedir=DEFAULT_OUTDIR,
+                 ttl=REMOTE_INDEX_TTL):
+        self.searchdir = searchdir
+        self.server = server
+        self.ttl = ttl
+        self.cache_path = os.path.join(cachedir, self.CACHE_FORMAT.format(
+            server.strip('/').replace('/', '_'),
+            searchdir.strip('/').replace('/', '_')))
+        self.files = None
+        self.created = None
+        self._refreshed = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get(cls, searchdir, server, cachedir=DEFAULT_OUTDIR):
+        """Get the shared ``RemoteDirectoryIndex`` for ``searchdir`` on
+        ``server``."""
+        key = (searchdir, server, os.path.abspath(cachedir))
+        with cls._indices_lock:
+            if not key in cls._indices:
+                cls._indices[key] = cls(searchdir, server, cachedir)
+            return cls._indices[key]
+
+    def _list(self, pattern):
+        """List the remote frame files under ``pattern`` and return a dict
+        mapping their filenames to their full remote paths. Raises a
+        ``GWDataFindException`` if the listing fails."""
+        return {os.path.basename(path): path
+                for path in Transport.get(self.server).list(pattern)}
+
+    def _save(self):
+        with open(self.cache_path, 'w') as f:
+            json.dump({'created': self.created, 'files': self.files}, f)
+
+    def _load_or_build(self):
+        """Load the listing from the cache, or build it from scratch if the
+        cache is missing or stale."""
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            if time.time() - cached['created'] < self.ttl:
+                self.files = cached['files']
+                self.created = cached['created']
+                return
+            complain("Remote index is stale, rebuilding:", self.cache_path)
+        except (IOError, ValueError, KeyError):
+            pass
+        complain("Listing {} on {}".format(self.searchdir, self.server))
+        created = time.time()
+        files = self._list(self.searchdir)
+        # an empty listing means the directory is missing or unreadable; don't
+        # cache it, or every frame would look missing until it expires.
+        if not files:
+            raise GWDataFindException("No frame files found under {} on {}."
+                                      .format(self.searchdir, self.server))
+        self.created = created
+        self.files = files
+        self._save()
+
+    def lookup(self, filename):
+        """Get the full remote path of the frame file ``filename``, relisting
+        the subdirectory it should be in if it is not yet in the index.
+        Returns ``None`` if the file cannot be found."""
+        with self._lock:
+            if self.files is None:
+                self._load_or_build()
+            if filename in self.files:
+                return self.files[filename]
+            try:
+                prefix = filename.split('-')[2][:self._SUBDIR_GPS_DIGITS]
+            except IndexError:
+                return None
+            if prefix in self._refreshed:
+                return None
+            found = self._list(self._SUBDIR_PATTERN_FMT.format(self.searchdir,
+                                                               prefix))
+            self._refreshed.add(prefix)
+            if found:
+                self.files.update(found)
+                self._save()
+            return self.files.get(filename)
+
+
 class RemoteFileInfo(object):
     """A container holding data about a remote frame file (based on its
     filename as returned by ``gw_data_find``) along with convenience methods
     for generating a proper local file name.
     
-    It is assumed that URLs returned by ``gw_data_find`` look like:
+    It is assumed that URLs returned by ``gw_data_find`` look like (all on
+    one line):
     
-    file://localhost/hdfs/frames/O2/hoft_C02/H1/H-H1_HOFT_C02-11869/H-H1_HOFT_C02-1186959360-4096.gwf
+    file://localhost/hdfs/frames/O2/hoft_C02/H1/H-H1_HOFT_C02-11869/
+        H-H1_HOFT_C02-1186959360-4096.gwf
 
     """
 
@@ -285,18 +1605,22 @@ class GWFrameQuery(object):
         self.framelength = framelength
         self.server = server
         self.outdir = outdir
+        # set by ``resolve_remote_urls`` to skip per-frame remote lookups
+        self.resolved_remote_url = None
+        # set by ``remote_sha256_batch`` for ``resolved_remote_url``
+        self.resolved_remote_sha256 = None
+        # the remote file's size and mtime when it was last stat'd
+        self.resolved_remote_stat = None
+        # time spent on each phase of the current download attempt
+        self.timing = dict()
+        self._attempt_started = None
 
     _FILENAME_FORMAT = '{}-{}-{}-{}.gwf'
 
-    _GW_DATA_FIND_QUERY_FMT = """gw_data_find \\
-        --observatory {} \\
-        --type {} \\
-        --gps-start-time {} \\
-        --gps-end-time {} \\
-        --url-type file
-    """
-
-    _TARGETED_SEARCH_QUERY_FMT = "find {} -name {}"
+    # local files that a query in this process is fetching or has fetched, so
+    # that duplicate queries resolving to the same frame skip it
+    _claimed = set()
+    _claimed_lock = threading.Lock()
 
     _TARGETED_SEARCH_DIRECTORIES = _TARGETED_SEARCH_DIRECTORIES
 
@@ -306,19 +1630,10 @@ class GWFrameQuery(object):
         "O2": (1164556817, 1187733618)
     }
 
-    _SHA256_SUM_FMT = "sha256sum '{}'"
-
-    def execute_cmd_over_ssh(self, cmd, exception=Exception):
-        """SSH into this Query's server and run ``cmd``, capturing and
-        returning a tuple containing (stdout, stderr) and throwing the
-        specified ``exception`` type in the event of a nonzero return code."""
-        fullcmd = ['gsissh', self.server, cmd]
-        proc = Popen(fullcmd, stdout=PIPE, stderr=PIPE)
-        res, err = proc.communicate()
-        complain("RETVAL:", proc.returncode, "STDOUT:", res, "STDERR:", err)
-        if proc.returncode != 0:
-            raise exception("Something went wrong: {}".format(err))
-        return (res, err)
+    @property
+    def transport(self):
+        """The shared ``Transport`` for this query's server."""
+        return Transport.get(self.server)
 
     @property
     def observing_run(self):
@@ -374,47 +1689,14 @@ class GWFrameQuery(object):
             self.local_filename_from_remote(remote_url)
         )
 
-    LOCAL_RIDER_TYPES = [
-        'remote_sha256',
-        'local_sha256',
-        'query_repr',
-        'error_msg',
-        'remote_url'
-    ]
-    RIDER_FORMAT = '.{}.{}.txt'
-    LocalRiders = collections.namedtuple('LocalRiders', LOCAL_RIDER_TYPES)
-
-    def estimated_rider_fullpaths(self):
-        """Get a ``LocalRiders`` namedtuple specifying the file paths to
-        rider files for this query. These files contain metadata about the
-        remote download, specifically, the remote and local sha256 sums, the
-        file query used to generate the file, and the remote_url originally
-        returned by gw_data_find. This is based on the *expected* filename, not
-        the actual filename as determined by ``gw_data_find``."""
-        filename = self.estimated_filename
-        rider_filenames = [
-            self.RIDER_FORMAT.format(
-                filename,
-                rider_type
-            ) for rider_type in self.LOCAL_RIDER_TYPES
-        ]
-        rider_fullpaths = [
-            os.path.join(self.outdir, fname) for fname in rider_filenames
-        ]
-        return self.LocalRiders(*rider_fullpaths)
-
-    def local_rider_fullpaths_from_remote(self, remote_url):
-        actual_local_filename = self.local_filename_from_remote(remote_url)
-        rider_filenames = [
-            self.RIDER_FORMAT.format(
-                actual_local_filename,
-                rider_type
-            ) for rider_type in self.LOCAL_RIDER_TYPES
-        ]
-        rider_fullpaths = [
-            os.path.join(self.outdir, fname) for fname in rider_filenames
-        ]
-        return self.LocalRiders(*rider_fullpaths)
+    @property
+    def manifest(self):
+        """The ``FrameManifest`` for this query's output directory."""
+        return FrameManifest.get(self.outdir)
+
+    def record_error(self, filename, msg):
+        """Add ``msg`` to the error history of the local file ``filename``."""
+        self.manifest.record(filename, 'error_msg', msg)
 
     def local_fullpath_from_remote_exists(self, remote_url):
         """Check whether the local file corresponding to the remote_url exists.
@@ -424,7 +1706,9 @@ class GWFrameQuery(object):
 
     def remote_url_targeted_search(self):
         """If the remote_url search fails, we can try a targetted search
-        instead for certain frame types and time periods."""
+        instead for certain frame types and time periods, looking the file up
+        in a cached listing of the remote frame directory (see
+        ``RemoteDirectoryIndex``)."""
         run = self.observing_run
         if run == None:
             raise TargetedSearchException("Cannot determine run.")
@@ -433,29 +1717,23 @@ class GWFrameQuery(object):
             searchdir = self._TARGETED_SEARCH_DIRECTORIES[key]
         except KeyError:
             raise TargetedSearchException("No search target dir defined.")
-        query = self._TARGETED_SEARCH_QUERY_FMT.format(
-            searchdir,
-            self.estimated_filename
-        )
-        res, err = self.execute_cmd_over_ssh(query, TargetedSearchException)
-        try:
-            return res.split('\n')[0].strip()
-            complain("Targeted search found file for {}".format(self))
-        except IndexError:
+        index = RemoteDirectoryIndex.get(searchdir, self.server, self.outdir)
+        remote_url = index.lookup(self.estimated_filename)
+        if remote_url is None:
             raise TargetedSearchException("No remote file found.")
+        complain("Targeted search found file for {}".format(self))
+        return remote_url
 
     def remote_url(self):
-        """Get the path to this frame file on the remote server. First, try a
-        search using ``gw_data_find``; if this fails, as often happens, do a
-        manually-targetted search."""
-        query = self._GW_DATA_FIND_QUERY_FMT.format(
-            self.detector,
-            self.frametype,
-            self.gpstime,
-            self.gpstime
-        )
-        res, err = self.execute_cmd_over_ssh(query, GWDataFindException)
-        remote_url = res.strip().replace('file://localhost', '')
+        """Get the path to this frame file on the remote server. If it has
+        already been found by ``resolve_remote_urls``, just return that.
+        Otherwise, first try a search using ``gw_data_find``; if this fails, as
+        often happens, do a manually-targetted search."""
+        if self.resolved_remote_url is not None:
+            return self.resolved_remote_url
+        found = self.transport.find(self.detector, self.frametype,
+                                    self.gpstime, self.gpstime)
+        remote_url = found[0] if found else ''
         if remote_url == '':
             msg = '{} not found using gw_data_find. Trying targetted search.'
             complain(msg.format(self))
@@ -468,47 +1746,49 @@ class GWFrameQuery(object):
         return remote_url
 
     def remote_sha256(self, remote_url=None):
-        """Get the sha256 sum for the file specified in ``self.remote_url()``
-        and write it to a rider file (if the rider file does not already
-        exist). Optionally override the ``remote_url`` argument, for example if
-        the remote URL (as returned by ``gw_data_find``) has already been
-        fetched."""
+        """Get the sha256 sum for the file specified in
+        ``self.remote_url()``. Optionally override the ``remote_url``
+        argument, for example if the remote URL (as returned by
+        ``gw_data_find``) has already been fetched."""
         # if no remote URL specified, find it automatically
         if remote_url == None:
             remote_url = self.remote_url()
+        # it might already have been calculated by ``remote_sha256_batch``
+        if (self.resolved_remote_sha256 is not None
+                and remote_url == self.resolved_remote_url):
+            return self.resolved_remote_sha256
         remote_fullpath = RemoteFileInfo(remote_url).fullpath
-        sha256cmd = self._SHA256_SUM_FMT.format(remote_fullpath)
         try:
-            res, err = self.execute_cmd_over_ssh(sha256cmd,
-                                                 GWRemoteSha256Exception)
-        except GWRemoteSha256Exception:
+            sums = self.transport.hash([remote_fullpath])
+            err = ''
+        except GWRemoteSha256Exception as e:
+            sums = dict()
+            err = e.args[0]
+        if not remote_fullpath in sums:
             errtime = datetime.utcnow().isoformat()
-            errfmt = "REMOTE_SHA256 ERROR at {}. STDERR: \n{}\n"
-            errmsg = errfmt.format(errtime, err)
+            errfmt = ("REMOTE_SHA256 ERROR at {}. Could not hash {}. "
+                      "ERROR: \n{}\n")
+            errmsg = errfmt.format(errtime, remote_fullpath, err)
             raise GWRemoteSha256Exception(errmsg)
-        return res.split()[0]
+        return sums[remote_fullpath]
 
     def local_sha256(self, remote_url=None):
         """Get the sha256 sum for the *local* file specified by
-        ``self.remote_url()`` and write it to a rider file (if the rider file
-        does not already exist). Optionally override the ``remote_url``
+        ``self.remote_url()``. Optionally override the ``remote_url``
         argument, for example if the remote URL (as returned by
         ``gw_data_find``) has already been fetched."""
         # if no remote URL specified, find it automatically
         if remote_url == None:
             remote_url = self.remote_url()
         fullpath = self.local_fullpath_from_remote(remote_url)
-        cmd = ['sha256sum', fullpath]
-        complain("Running command in subprocess:", cmd)
-        proc = Popen(cmd, **_PIPE_ARGS)
-        res, err = proc.communicate()
-        complain("RETVAL:", proc.returncode, "STDOUT:", res, "STDERR:", err)
-        if proc.returncode != 0:
+        complain("Hashing local file:", fullpath)
+        try:
+            return sha256_file(fullpath)
+        except (IOError, OSError) as e:
             errtime = datetime.utcnow().isoformat()
-            errfmt = "LOCAL_SHA256 ERROR at {}. STDERR: \n{}\n"
-            errmsg = errfmt.format(errtime, err)
+            errfmt = "LOCAL_SHA256 ERROR at {}. ERROR: \n{}\n"
+            errmsg = errfmt.format(errtime, e)
             raise GWLocalSha256Exception(errmsg)
-        return res.split()[0]
 
     def local_file_corrupted(self, remote_url=None):
         """Check whether the local downloaded file is corrupt, e.g. due to an
@@ -519,97 +1799,295 @@ class GWFrameQuery(object):
         server (to save time if it has already been calculated)."""
         if remote_url == None:
             remote_url = self.remote_url()
-        riders = self.local_rider_fullpaths_from_remote(remote_url)
-        try:
-            with open(riders.remote_sha256, 'r') as f:
-                remote_sha256 = f.read()
-            with open(riders.local_sha256, 'r') as f:
-                local_sha256 = f.read()
-            if local_sha256 != remote_sha256:
-                return True
-        except IOError:
-            return True
-        # if we made it to the end, checks have passed and the file is not
-        # corrupt
-        return False
+        filename = self.local_filename_from_remote(remote_url)
+        return filename in self.manifest.corrupt_files([filename])
 
     def download(self):
         """Download the file specified in ``self.remote_url()`` from the
         remote server. The remote file might actually have a different filename
         than what is expected, particularly if the user has incorrectly
         guessed the frame duration, so an extra check is made to see if the
-        local filename differs. Also write the ``self.remote_url()`` to a rider
-        file for future reference."""
+        local filename differs. Also record the ``self.remote_url()`` in the
+        output directory's manifest for future reference. This runs the
+        ``lookup``, ``fetch`` and ``verify`` stages in turn; see
+        ``DownloadPipeline`` for running them concurrently on many
+        queries."""
+        if self.lookup():
+            local_sha256 = self.fetch()
+            if local_sha256 is not None:
+                self.verify(local_sha256)
+
+    def _timed(self, phase, method, *args):
+        """Call ``method(*args)``, storing the time it took in
+        ``self.timing[phase]``. If it fails, record the time lost on this
+        download attempt in the manifest before reraising the exception."""
+        started = time.time()
+        try:
+            return method(*args)
+        except Exception as e:
+            self.timing[phase] = time.time() - started
+            lost = time.time() - self._attempt_started
+            self.manifest.record(self.estimated_filename, 'failed_attempt',
+                                 dict(self.timing, server=self.server,
+                                      phase=phase, lost=lost))
+            raise e
+        finally:
+            self.timing[phase] = time.time() - started
+
+    def lookup(self):
+        """Start a new download attempt, running the lookup stage (see
+        ``_lookup``) and timing it."""
+        self.timing = dict()
+        self._attempt_started = time.time()
+        return self._timed('lookup', self._lookup)
+
+    def fetch(self):
+        """Run the transfer stage (see ``_fetch``) and time it. Returns
+        ``None`` if there was nothing to fetch."""
+        return self._timed('transfer', self._fetch)
+
+    def verify(self, local_sha256):
+        """Run the verification stage (see ``_verify``) and time it, then
+        record the timing of every phase of this download attempt, along with
+        the server used and the number of bytes transferred, in the
+        manifest."""
+        self._timed('hash', self._verify, local_sha256)
+        self.timing['total'] = time.time() - self._attempt_started
+        self.manifest.record(
+            self.local_filename_from_remote(self.remote_url()), 'timing',
+            dict(self.timing, server=self.server)
+        )
+
+    def _lookup(self):
+        """Find the remote file for this query (storing it in
+        ``self.resolved_remote_url``). Returns ``True`` if the file needs to
+        be downloaded because it is missing or known to be corrupt."""
         remote_url = self.remote_url()
         # we might not be able to parse the path if the remote file does not
         # exist. in this case, log the error and move on to the next file.
         try:
             local_fullpath = self.local_fullpath_from_remote(remote_url)
         except FileNameParsingError as e:
-            estimated_riders = self.estimated_rider_fullpaths()
-            with open(estimated_riders.error_msg, 'a') as f:
-                f.write(e.args[0] + '\n')
+            self.record_error(self.estimated_filename, e.args[0] + '\n')
             raise e
-        riders = self.local_rider_fullpaths_from_remote(remote_url)
-        # Check whether the file has been partially downloaded or is corrupt.
-        # If it is corrupt, delete it so that it can be redownloaded.
+        self.resolved_remote_url = remote_url
+        local_filename = self.local_filename_from_remote(remote_url)
+        # Check whether the downloaded file is corrupt. If it is, download it
+        # again; the new copy replaces it once it is complete, so it is left
+        # in place until then (only ``verify`` deletes files).
         if os.path.isfile(local_fullpath):
-            if self.local_file_corrupted(remote_url):
-                #  check whether the file was modified in the last minute.  If
-                #  so, then it might still be an active download and should be
-                #  left alone.
-                if time_since_file_modified(local_fullpath) > 60:
-                    errtime = datetime.utcnow().isoformat()
-                    errfmt = "CORRUPT FILE at {}. DELETING AND PROCEEDING.\n"
-                    errmsg = errfmt.format(errtime)
-                    with open(riders.error_msg, 'a') as f:
-                        f.write(errmsg)
+            if not self.local_file_corrupted(remote_url):
+                return False
+            errtime = datetime.utcnow().isoformat()
+            errfmt = "CORRUPT FILE at {}. REDOWNLOADING.\n"
+            self.record_error(local_filename, errfmt.format(errtime))
+        return True
+
+    def _claim(self, local_fullpath):
+        """Claim ``local_fullpath`` for this query to fetch, returning
+        ``False`` if another query in this process already claimed it."""
+        with GWFrameQuery._claimed_lock:
+            if local_fullpath in GWFrameQuery._claimed:
+                return False
+            GWFrameQuery._claimed.add(local_fullpath)
+            return True
+
+    def _release(self, local_fullpath):
+        """Give up the claim on ``local_fullpath`` after a failed fetch or
+        verification, so that it can be tried again."""
+        with GWFrameQuery._claimed_lock:
+            GWFrameQuery._claimed.discard(local_fullpath)
+
+    def _fetch(self):
+        """Copy the remote file found by ``lookup`` into place in the output
+        directory, returning the sha256 sum of the local copy. Returns
+        ``None`` without fetching anything if another query in this process
+        has already claimed the same file (see ``_claim``) or an intact copy
+        has appeared since the lookup."""
+        remote_url = self.remote_url()
+        local_fullpath = self.local_fullpath_from_remote(remote_url)
+        local_filename = self.local_filename_from_remote(remote_url)
+        if not self._claim(local_fullpath):
+            complain("Already fetched by another query, skipping:", self)
+            return None
+        try:
+            if (os.path.isfile(local_fullpath) and
+                    not self.local_file_corrupted(remote_url)):
+                complain("Already downloaded, skipping:", self)
+                return None
+            return self._fetch_claimed(remote_url, local_fullpath,
+                                       local_filename)
+        except Exception as e:
+            self._release(local_fullpath)
+            raise e
+
+    def _fetch_claimed(self, remote_url, local_fullpath, local_filename):
+        """Do the work of ``_fetch`` once the file has been claimed."""
+        manifest = self.manifest
+        part_fullpath = local_fullpath + self.PARTIAL_SUFFIX
+        # another process might be downloading this file right now
+        if (os.path.isfile(part_fullpath) and
+                time_since_file_modified(part_fullpath) < 60):
+            raise GWDataDownloadException(
+                "Partial download still in progress: " + part_fullpath)
+        # record the remote url for debugging and record-keeping
+        manifest.record(local_filename, 'remote_url', remote_url)
+        # record a representation of this query
+        manifest.record(local_filename, 'query_repr', repr(self))
+        # another job might have downloaded this file already
+        local_sha256 = self.link_from_shared_index(remote_url, local_fullpath)
+        if local_sha256 is not None:
+            return local_sha256
+        try:
+            local_sha256 = self.transfer(remote_url, part_fullpath)
+        except GWDataDownloadException as e:
+            self.record_error(local_filename, e.args[0])
+            raise e
+        os.rename(part_fullpath, local_fullpath)
+        return local_sha256
+
+    def _verify(self, local_sha256):
+        """Record the remote sha256 sum of the file copied by ``fetch`` in the
+        manifest alongside ``local_sha256``, the sum of the local copy, so that
+        the two can be compared. If they don't match, delete the local copy
+        and raise a ``GWDataDownloadException`` so it can be retried."""
+        remote_url = self.remote_url()
+        local_filename = self.local_filename_from_remote(remote_url)
+        local_fullpath = self.local_fullpath_from_remote(remote_url)
+        # get the remote sha256 sum
+        try:
+            remote_sha256 = self.remote_sha256(remote_url)
+            self.manifest.record(local_filename, 'remote_sha256',
+                                 remote_sha256)
+        except GWRemoteSha256Exception as e:
+            self.record_error(local_filename, e.args[0])
+            self._release(local_fullpath)
+            raise e
+        # the local sha256 sum was calculated during the transfer
+        self.manifest.record(local_filename, 'local_sha256', local_sha256)
+        if local_sha256 != remote_sha256:
+            errtime = datetime.utcnow().isoformat()
+            errfmt = "SHA256 MISMATCH at {}. DELETING CORRUPT FILE.\n"
+            errmsg = errfmt.format(errtime)
+            self.record_error(local_filename, errmsg)
+            if os.path.isfile(local_fullpath):
+                os.remove(local_fullpath)
+            self._release(local_fullpath)
+            raise GWDataDownloadException(errmsg)
+        elif SharedFrameIndex.get() is not None:
+            SharedFrameIndex.get().add(RemoteFileInfo(remote_url).fullpath,
+                                       local_sha256,
+                                       self.local_fullpath_from_remote(
+                                           remote_url),
+                                       self.resolved_remote_stat)
+
+    def link_from_shared_index(self, remote_url, local_fullpath):
+        """If an intact copy of the remote file at ``remote_url`` has already
+        been downloaded by any job using the ``SharedFrameIndex``, link (or
+        copy) it to ``local_fullpath`` and return its sha256 sum. A copy is
+        only used if the remote file is unchanged since it was downloaded,
+        i.e. if the remote file's size and modification time (or, if those
+        weren't recorded, its sha256 sum) still match. Returns ``None`` if no
+        usable copy is found."""
+        index = SharedFrameIndex.get()
+        if index is None:
+            return None
+        candidates = index.candidates(RemoteFileInfo(remote_url).fullpath)
+        if not candidates:
+            return None
+        size, mtime = self.remote_stat(remote_url)
+        self.resolved_remote_stat = '{} {}'.format(size, mtime)
+        for record in candidates:
+            if record['size'] != size:
+                continue
+            if record.get('remote_stat') is not None:
+                if record['remote_stat'] != self.resolved_remote_stat:
+                    continue
+            elif record['sha256'] != self.remote_sha256(remote_url):
+                continue
+            try:
+                method, sha256 = link_or_copy(record['local_path'],
+                                              local_fullpath,
+                                              DiskSpaceGuard.get(self.outdir))
+            except (OSError, IOError, GWDataDownloadException) as e:
+                complain("Could not copy {}:".format(record['local_path']), e)
+                continue
+            if sha256 is None:
+                # a hardlink is the indexed file itself; just make sure it
+                # hasn't changed size since it was indexed
+                if os.path.getsize(local_fullpath) != record['size']:
                     os.remove(local_fullpath)
-        # only download the file if it does not exist locally.
-        if not os.path.isfile(local_fullpath):
-            download_url = '{}:{}'.format(self.server, remote_url)
-            # record the remote url for debugging and record-keeping
-            with open(riders.remote_url, 'w') as f:
-                f.write(remote_url)
-            # record a representation of this query
-            with open(riders.query_repr, 'w') as f:
-                f.write(repr(self))
-            cmd = [
-                'gsiscp',
-                download_url,
-                local_fullpath
-            ]
-            complain("Running command in subprocess:", cmd)
-            proc = Popen(cmd, **_PIPE_ARGS)
-            res, err = proc.communicate()
-            complain("RETVAL:", proc.returncode, "STDOUT:", res, "STDERR:",
-                     err)
-            if proc.returncode == 0:
-                # get the remote sha256 sum
-                try:
-                    remote_sha256 = self.remote_sha256(remote_url)
-                    with open(riders.remote_sha256, 'w') as f:
-                        f.write(remote_sha256)
-                except GWRemoteSha256Exception as e:
-                    with open(riders.error_msg, 'a') as f:
-                        f.write(e.args[0])
-                    raise e
-                # get the local sha256 sum
-                try:
-                    local_sha256 = self.local_sha256(remote_url)
-                    with open(riders.local_sha256, 'w') as f:
-                        f.write(local_sha256)
-                except GWLocalSha256Exception as e:
-                    with open(riders.error_msg, 'a') as f:
-                        f.write(e.args[0])
-                    raise e
-            else:
-                errtime = datetime.utcnow().isoformat()
-                errfmt = "DOWNLOAD ERROR at {}. STDERR: \n{}\n"
-                errmsg = errfmt.format(errtime, err)
-                with open(riders.error_msg, 'a') as f:
-                    f.write(errmsg)
-                raise GWDataDownloadException(errmsg)
+                    continue
+                sha256 = record['sha256']
+            complain("Used {} of {} for {}".format(method,
+                                                   record['local_path'],
+                                                   local_fullpath))
+            self.manifest.record(os.path.basename(local_fullpath),
+                                 'linked_from', record['local_path'])
+            self.timing['bytes'] = 0
+            return sha256
+        return None
+
+    PARTIAL_SUFFIX = '.part'
+
+    def remote_stat(self, remote_url):
+        """Get a ``(size, mtime)`` tuple for the remote file at
+        ``remote_url``."""
+        return self.transport.stat(RemoteFileInfo(remote_url).fullpath)
+
+    def transfer(self, remote_url, part_fullpath):
+        """Copy the remote file at ``remote_url`` to ``part_fullpath``,
+        returning the sha256 sum of the local copy (calculated as the data
+        streams in, so the file does not need to be read again). If
+        ``part_fullpath`` already exists and the remote file's size and
+        modification time are unchanged since the partial download started,
+        resume from the end of the partial file instead of starting over.
+        Raises a ``GWDataDownloadException`` if the transfer fails or the
+        local copy ends up the wrong size."""
+        fullpath = RemoteFileInfo(remote_url).fullpath
+        local_filename = os.path.basename(part_fullpath)[
+            :-len(self.PARTIAL_SUFFIX)]
+        size, mtime = self.remote_stat(remote_url)
+        remote_stat = '{} {}'.format(size, mtime)
+        self.resolved_remote_stat = remote_stat
+        sha256 = hashlib.sha256()
+        offset = 0
+        partial = self.manifest.lookup(local_filename)
+        if (os.path.isfile(part_fullpath) and
+                remote_stat == partial.get('partial_remote_stat')):
+            offset = os.path.getsize(part_fullpath)
+            if offset > size:
+                offset = 0
+        if offset:
+            complain("Resuming {} at byte {} of {}".format(part_fullpath,
+                                                           offset, size))
+            with open(part_fullpath, 'rb') as f:
+                for chunk in iter(lambda: f.read(TRANSFER_CHUNK_SIZE), b''):
+                    sha256.update(chunk)
+        else:
+            self.manifest.record(local_filename, 'partial_remote_stat',
+                                 remote_stat)
+        self.timing['bytes'] = size - offset
+        # don't start a transfer that would fill up the disk
+        guard = DiskSpaceGuard.get(self.outdir)
+        guard.reserve(size - offset, part_fullpath, offset)
+        try:
+            with open(part_fullpath, 'ab' if offset else 'wb') as outfile:
+                for chunk in self.transport.transfer(fullpath, offset):
+                    outfile.write(chunk)
+                    sha256.update(chunk)
+        finally:
+            written = 0
+            if os.path.isfile(part_fullpath):
+                written = os.path.getsize(part_fullpath) - offset
+            guard.release(size - offset, written, part_fullpath)
+        local_size = os.path.getsize(part_fullpath)
+        if local_size != size:
+            errtime = datetime.utcnow().isoformat()
+            errfmt = "DOWNLOAD ERROR at {}. Got {} of {} bytes.\n"
+            raise GWDataDownloadException(errfmt.format(errtime, local_size,
+                                                        size))
+        return sha256.hexdigest()
 
     def __repr__(self):
         fmt="{}('{}', '{}', '{}', framelength='{}', server='{}', outdir='{}')"
@@ -624,6 +2102,325 @@ class GWFrameQuery(object):
         )
 
 
+class DownloadProgress(object):
+    """A thread-safe tally of download outcomes, both overall and per server,
+    shared by the workers of a ``DownloadPool``."""
+
+    def __init__(self, total):
+        self.total = total
+        self.counts = collections.Counter()
+        self.server_counts = collections.defaultdict(collections.Counter)
+        self.active = dict()
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+
+    def started(self, server, query):
+        """Record that ``server`` started working on ``query``."""
+        with self._lock:
+            self.active[query] = server
+
+    def finished(self, server, query, outcome):
+        """Record that ``server`` finished ``query`` with the given
+        ``outcome``, e.g. 'downloaded', 'skipped', 'failed', or 'retried' (if
+        the query has been handed back for another server to try)."""
+        with self._lock:
+            self.active.pop(query, None)
+            self.counts[outcome] += 1
+            self.server_counts[server][outcome] += 1
+
+    @property
+    def done(self):
+        """The number of queries that will not be tried again."""
+        with self._lock:
+            return sum(self.counts[k]
+                       for k in ('downloaded', 'skipped', 'failed'))
+
+    def summary(self):
+        """Get a human-readable summary of progress so far."""
+        with self._lock:
+            elapsed = time.time() - self.start_time
+            done = sum(self.counts[k]
+                       for k in ('downloaded', 'skipped', 'failed'))
+            lines = ["{}/{} frames finished in {:.0f}s ({:.3f} frames/s): "
+                     "{}".format(done, self.total, elapsed,
+                                 done / max(elapsed, 1.),
+                                 dict(self.counts))]
+            for server in sorted(self.server_counts):
+                active = len([s for s in self.active.values() if s == server])
+                lines.append("    {}: {} active, {}".format(
+                    server, active, dict(self.server_counts[server])))
+            return '\n'.join(lines)
+
+
+class DownloadPool(object):
+    """Download a list of ``GWFrameQuery`` objects in parallel from several
+    servers, with ``jobs_per_server`` worker threads per server taking frames
+    from a shared queue (so faster servers naturally take on more of the
+    work). A query that fails is handed back to the queue for a server that
+    has not yet tried it; a server that fails ``FAILURE_THRESHOLD`` times in
+    a row is left alone for ``COOLDOWN`` seconds. A query whose remote
+    filename can't be parsed will never succeed, so it is put in
+    ``unparseable`` instead of being handed back or retried."""
+
+    FAILURE_THRESHOLD = 3
+    COOLDOWN = 300
+
+    def __init__(self, queries, servers,
+                 jobs_per_server=DEFAULT_JOBS_PER_SERVER):
+        self.queries = queries
+        self.servers = list(servers)
+        self.jobs_per_server = jobs_per_server
+        self.progress = DownloadProgress(len(queries))
+        self.failed = list()
+        self.unparseable = list()
+        self._queue = queue.Queue()
+        self._tried = collections.defaultdict(set)
+        self._consecutive_failures = collections.Counter()
+        self._down_until = dict()
+        self._lock = threading.Lock()
+
+    def _server_available(self, server):
+        with self._lock:
+            return self._down_until.get(server, 0) <= time.time()
+
+    def _record_result(self, server, success):
+        with self._lock:
+            if success:
+                self._consecutive_failures[server] = 0
+                return
+            self._consecutive_failures[server] += 1
+            if self._consecutive_failures[server] >= self.FAILURE_THRESHOLD:
+                complain("{} failed {} times in a row; pausing it for {}s."
+                         .format(server, self._consecutive_failures[server],
+                                 self.COOLDOWN))
+                self._down_until[server] = time.time() + self.COOLDOWN
+                self._consecutive_failures[server] = 0
+
+    def _worker(self, server):
+        """Download queries from the shared queue using ``server`` until a
+        ``None`` sentinel is received."""
+        while True:
+            query = self._queue.get()
+            if query is None:
+                self._queue.task_done()
+                return
+            untried = set(self.servers) - self._tried[query]
+            # give other servers a chance at queries this one already failed,
+            # and leave all queries to other servers while this one is paused
+            if ((server in self._tried[query] and untried) or
+                    not self._server_available(server)):
+                self._queue.put(query)
+                self._queue.task_done()
+                time.sleep(1)
+                continue
+            self._tried[query].add(server)
+            query.server = server
+            self.progress.started(server, query)
+            try:
+                if query.estimated_fullpath_exists():
+                    outcome = 'skipped'
+                else:
+                    query.download()
+                    outcome = 'downloaded'
+                self._record_result(server, True)
+            except FileNameParsingError:
+                complain('Filename parse error, skipping:', query)
+                with self._lock:
+                    self.unparseable.append(query)
+                outcome = 'failed'
+            except Exception as err:
+                complain("Exception caught on {}:".format(server), query, err)
+                self._record_result(server, False)
+                if set(self.servers) - self._tried[query]:
+                    self._queue.put(query)
+                    outcome = 'retried'
+                else:
+                    outcome = 'failed'
+                    with self._lock:
+                        self.failed.append(query)
+            self.progress.finished(server, query, outcome)
+            self._queue.task_done()
+
+    def run(self):
+        """Download all queries, periodically reporting progress. Returns a
+        list of the queries that could not be downloaded from any server
+        (not including ``unparseable`` ones)."""
+        def feed():
+            for query in with_remote_sha256_batches(self.queries):
+                self._queue.put(query)
+        threads = [threading.Thread(target=self._worker, args=(server,))
+                   for server in self.servers
+                   for _ in range(self.jobs_per_server)]
+        feeder = threading.Thread(target=feed)
+        for thread in threads + [feeder]:
+            thread.daemon = True
+            thread.start()
+        next_report = time.time() + PROGRESS_INTERVAL
+        while self.progress.done < len(self.queries):
+            time.sleep(1)
+            if time.time() >= next_report:
+                complain(self.progress.summary())
+                next_report += PROGRESS_INTERVAL
+        for _ in threads:
+            self._queue.put(None)
+        self._queue.join()
+        complain(self.progress.summary())
+        return self.failed
+
+
+class DownloadPipeline(object):
+    """Download a list of ``GWFrameQuery`` objects from a single server with
+    the stages of each download overlapping: a resolver thread runs
+    ``lookup`` on upcoming frames, a transfer thread runs ``fetch`` on one
+    frame at a time, and a verifier thread runs ``verify`` on frames that have
+    finished transferring. This keeps the link busy while other frames are
+    being looked up or hashed. The queues between stages hold at most
+    ``depth`` frames, so lookups don't race too far ahead of transfers. As in
+    a ``DownloadPool``, queries whose remote filename can't be parsed
+    (including those whose remote file can't be found) are put in
+    ``unparseable`` rather than ``failed``, since retrying won't help."""
+
+    def __init__(self, queries, depth=PIPELINE_DEPTH):
+        self.queries = queries
+        self.depth = depth
+        self.failed = list()
+        self.unparseable = list()
+        self._lock = threading.Lock()
+
+    def _fail(self, stage, query, err):
+        complain("Exception caught in {} stage:".format(stage), query, err)
+        with self._lock:
+            self.failed.append(query)
+
+    def _resolve(self, resolved):
+        # local files already headed for the transfer stage
+        queued = set()
+        for query in with_remote_sha256_batches(self.queries):
+            try:
+                if not query.estimated_fullpath_exists() and query.lookup():
+                    filename = query.local_filename_from_remote(
+                        query.remote_url())
+                    if filename in queued:
+                        complain('Duplicate of a queued frame, skipping:',
+                                 query)
+                        continue
+                    queued.add(filename)
+                    resolved.put(query)
+            except FileNameParsingError:
+                complain('Filename parse error, skipping:', query)
+                with self._lock:
+                    self.unparseable.append(query)
+            except Exception as err:
+                self._fail('resolver', query, err)
+        resolved.put(None)
+
+    def _transfer(self, resolved, transferred):
+        while True:
+            query = resolved.get()
+            if query is None:
+                transferred.put(None)
+                return
+            try:
+                local_sha256 = query.fetch()
+                if local_sha256 is not None:
+                    transferred.put((query, local_sha256))
+            except Exception as err:
+                self._fail('transfer', query, err)
+
+    def _verify(self, transferred):
+        while True:
+            item = transferred.get()
+            if item is None:
+                return
+            query, local_sha256 = item
+            try:
+                query.verify(local_sha256)
+            except Exception as err:
+                self._fail('verifier', query, err)
+
+    def run(self):
+        """Download all queries. Returns a list of the queries that failed in
+        any stage (not including ``unparseable`` ones)."""
+        resolved = queue.Queue(self.depth)
+        transferred = queue.Queue(self.depth)
+        threads = [
+            threading.Thread(target=self._resolve, args=(resolved,)),
+            threading.Thread(target=self._transfer,
+                             args=(resolved, transferred)),
+            threading.Thread(target=self._verify, args=(transferred,))
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        # join with a timeout so that the main thread can still be interrupted
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(1)
+        return self.failed
+
+
+class RetryQueue(object):
+    """Queries that failed to download, each of which is retried after a delay
+    that doubles with every failure (starting at ``backoff`` seconds and
+    capped at ``max_backoff`` seconds) until it succeeds or has been retried
+    ``retries`` times. A negative value of ``retries`` retries forever."""
+
+    def __init__(self, retries, backoff=RETRY_BACKOFF,
+                 max_backoff=RETRY_BACKOFF_MAX):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = collections.Counter()
+        self.failed = list()
+        self._heap = list()
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, query):
+        """Record a failed attempt at ``query`` and schedule another one, or
+        give up on it if it has no retries left."""
+        self.failures[query] += 1
+        failures = self.failures[query]
+        if self.retries >= 0 and failures > self.retries:
+            complain("Giving up on {} after {} attempts.".format(query,
+                                                                failures))
+            self.failed.append(query)
+            return
+        delay = min(self.backoff * 2**(failures - 1), self.max_backoff)
+        complain("Will retry {} in {}s (retry {}).".format(query, delay,
+                                                           failures))
+        # the counter breaks ties so that queries are never compared
+        heapq.heappush(self._heap,
+                       (time.time() + delay, next(self._order), query))
+
+    def run(self, download):
+        """Call ``download`` on each query as its retry comes due, scheduling
+        another retry for any that fail again. Returns a list of the queries
+        that were given up on."""
+        while self._heap:
+            due, _, query = heapq.heappop(self._heap)
+            wait = due - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                download(query)
+            except FileNameParsingError:
+                complain('Filename parse error, skipping:', query)
+                self.failed.append(query)
+            except Exception as err:
+                complain("Exception caught on retry:", query, err)
+                self.add(query)
+        return self.failed
+
+
+def download_if_missing(query):
+    """Download the file for ``query`` unless it already exists locally."""
+    if not query.estimated_fullpath_exists():
+        query.download()
+
+
 def get_times(start, deltat, frlength):
     """Get a list of start times for frame files based on in initial starting
     time, ``start``, and a specified length of time, ``deltat``. The initial
@@ -645,6 +2442,59 @@ def get_times(start, deltat, frlength):
     )
 
 
+def read_gstlal_trigger_times(trigger_dir):
+    """Get a sorted list of GPS trigger times from the names of the GSTLAL
+    event directories in ``trigger_dir``, which look like
+    ``gstlal-offline-1171612765_+4.118e-05`` (the GPS event time followed by
+    the false alarm rate)."""
+    return sorted(int(d.split("-")[2].split("_")[0])
+                  for d in os.listdir(trigger_dir)
+                  if d.startswith("gstlal-offline-"))
+
+
+def prioritize_triggers(queries, trigger_times):
+    """Sort ``queries`` so that the frames closest to any of the GPS times in
+    ``trigger_times`` come first."""
+    trigger_times = sorted(trigger_times)
+    def distance(query):
+        middle = query.gpstime + query.framelength / 2.
+        i = bisect.bisect(trigger_times, middle)
+        return min(abs(middle - t) for t in trigger_times[max(i-1, 0):i+1])
+    return sorted(queries, key=lambda q: (distance(q), q.gpstime,
+                                          q.detector, q.frametype))
+
+
+def merge_windows(times, frlength):
+    """Merge overlapping or adjacent time windows so that no frame is queried
+    more than once.
+
+    Returns
+    -------
+
+    ``merged``  A list of non-overlapping ``(start, deltat)`` tuples, sorted by
+                ``start``, covering exactly the frames that ``get_times``
+                would have returned for the windows in ``times``.
+
+    Arguments
+    ---------
+
+    ``times``       A list of ``(start, deltat)`` tuples, e.g. as returned by
+                    ``read_starts_and_deltats``.
+    ``frlength``    The expected duration in seconds of each frame file.
+    """
+    # the start times of the first and last frame in each window
+    spans = sorted((frames[0], frames[-1]) for frames in
+                   (get_times(start, deltat, frlength)
+                    for start, deltat in times))
+    merged = list()
+    for first, last in spans:
+        if merged and first <= merged[-1][1] + frlength:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return [(first, last - first) for first, last in merged]
+
+
 def get_queries(
         start,
         deltat,
@@ -690,6 +2540,195 @@ def get_queries(
     return queries
 
 
+def contiguous_windows(queries):
+    """Split a list of ``GWFrameQuery`` objects into lists of queries whose
+    frames are contiguous in time, i.e. where each frame starts where the
+    previous one ends. Each list is sorted by GPS time. Queries for different
+    detectors, frametypes, or servers are never put in the same window."""
+    groups = collections.defaultdict(list)
+    for query in queries:
+        groups[(query.detector, query.frametype, query.server)].append(query)
+    windows = list()
+    for key in sorted(groups):
+        group = sorted(groups[key], key=lambda q: q.gpstime)
+        window = [group[0]]
+        for query in group[1:]:
+            if query.gpstime > window[-1].gpstime + window[-1].framelength:
+                windows.append(window)
+                window = list()
+            window.append(query)
+        windows.append(window)
+    return windows
+
+
+def resolve_remote_urls(queries):
+    """Find the remote URLs for many ``GWFrameQuery`` objects at once by
+    running a single ``gw_data_find`` over each contiguous time window (see
+    ``contiguous_windows``) instead of one per frame. Each returned file is
+    mapped to every query whose GPS time it contains, and the query's
+    ``resolved_remote_url`` is set accordingly. Queries not covered by any
+    returned file are left unresolved (so that ``remote_url`` falls back to
+    a per-frame search for them) and are returned in a list; the gaps they
+    span are reported with ``complain``."""
+    unresolved = list()
+    for window in contiguous_windows(queries):
+        first, last = window[0], window[-1]
+        try:
+            found = first.transport.find(first.detector, first.frametype,
+                                         first.gpstime,
+                                         last.gpstime + last.framelength)
+        except GWDataFindException as e:
+            complain("Bulk gw_data_find failed, skipping window:", first,
+                     last, e)
+            unresolved += window
+            continue
+        # map start times of returned files to their full remote paths
+        remote_files = dict()
+        for line in found:
+            info = RemoteFileInfo(line)
+            try:
+                start = int(info.gps_start_time)
+                duration = int(info.frame_duration)
+            except (FileNameParsingError, ValueError):
+                complain("Could not parse gw_data_find result:", line)
+                continue
+            remote_files[start] = (duration, info.fullpath)
+        starts = sorted(remote_files)
+        gaps = list()
+        nmissing = 0
+        for query in window:
+            i = bisect.bisect_right(starts, query.gpstime) - 1
+            if i >= 0:
+                duration, fullpath = remote_files[starts[i]]
+                if query.gpstime < starts[i] + duration:
+                    query.resolved_remote_url = fullpath
+                    continue
+            unresolved.append(query)
+            nmissing += 1
+            # merge adjacent missing frames into a single reported gap
+            if gaps and gaps[-1][1] == query.gpstime:
+                gaps[-1][1] = query.gpstime + query.framelength
+            else:
+                gaps.append([query.gpstime, query.gpstime + query.framelength])
+        complain("gw_data_find found {} files covering {}/{} frames from {} "
+                 "to {}.".format(len(starts), len(window) - nmissing,
+                                 len(window), first, last))
+        if gaps:
+            complain("Gaps in gw_data_find results (will search per-frame):",
+                     *["{}-{} {}: [{}, {})".format(first.detector,
+                                                   first.frametype,
+                                                   first.server, *gap)
+                       for gap in gaps])
+    return unresolved
+
+
+def learn_frame_durations(queries):
+    """Fix up ``queries`` using the actual durations of the remote frames
+    found by ``resolve_remote_urls``, since ``--length`` might be wrong for
+    some frametypes (e.g. 4096s hoft frames vs. 64s raw frames), in which
+    case many queries resolve to the same remote file and already-downloaded
+    files are not recognized. For each detector and frametype whose resolved
+    frames don't match the queried length, the query grid is regenerated:
+    queries resolving to the same remote file are merged into a single query
+    for that file's start time and duration, and unresolved queries are moved
+    onto a grid with the most common resolved duration. Returns the new list
+    of queries, sorted by GPS time."""
+    groups = collections.defaultdict(list)
+    for query in queries:
+        groups[(query.detector, query.frametype)].append(query)
+    result = list()
+    for key in sorted(groups):
+        group = groups[key]
+        # map each query with a resolved remote file to the file's start time
+        # and duration
+        spans = dict()
+        for query in group:
+            if query.resolved_remote_url:
+                info = RemoteFileInfo(query.resolved_remote_url)
+                try:
+                    spans[query] = (int(info.gps_start_time),
+                                    int(info.frame_duration))
+                except (FileNameParsingError, ValueError):
+                    pass
+        if all(spans[q][1] == q.framelength for q in spans):
+            result += group
+            continue
+        durations = collections.Counter(d for start, d in spans.values())
+        duration = durations.most_common(1)[0][0]
+        # frames might not start at multiples of their duration
+        offset = [start for start, d in spans.values()
+                  if d == duration][0] % duration
+        complain("{}-{} frames are {}s long, not {}s; regenerating "
+                 "queries.".format(key[0], key[1], duration,
+                                   group[0].framelength))
+        regridded = collections.OrderedDict()
+        for query in group:
+            if query in spans:
+                gpstime, length = spans[query]
+            else:
+                gpstime = ((query.gpstime - offset) // duration * duration +
+                           offset)
+                length = duration
+            if gpstime in regridded:
+                continue
+            new = GWFrameQuery(query.detector, query.frametype, gpstime,
+                               framelength=length, server=query.server,
+                               outdir=query.outdir)
+            new.resolved_remote_url = query.resolved_remote_url
+            new.resolved_remote_sha256 = query.resolved_remote_sha256
+            regridded[gpstime] = new
+        complain("Merged {} {}-{} queries into {}.".format(
+            len(group), key[0], key[1], len(regridded)))
+        result += regridded.values()
+    result.sort(key=lambda q: (q.gpstime, q.detector, q.frametype))
+    return result
+
+
+def remote_sha256_batch(queries):
+    """Calculate the remote sha256 sums of the files for many
+    ``GWFrameQuery`` objects with a single ``Transport.hash`` call (i.e. a
+    single remote ``sha256sum``) per server instead of one call per file.
+    Only queries whose ``resolved_remote_url`` is already known (see
+    ``resolve_remote_urls``) are hashed. The sums are stored in each query's
+    ``resolved_remote_sha256`` (where ``remote_sha256`` will find them) and
+    recorded in the queries' manifests. Files that could not be hashed are
+    reported and left for ``remote_sha256`` to retry."""
+    by_server = collections.defaultdict(lambda: collections.defaultdict(list))
+    for query in queries:
+        if query.resolved_remote_url and query.resolved_remote_sha256 is None:
+            by_server[query.server][query.resolved_remote_url].append(query)
+    for server in by_server:
+        paths = by_server[server]
+        sums = Transport.get(server).hash(sorted(paths))
+        for path in paths:
+            if not path in sums:
+                continue
+            for query in paths[path]:
+                query.resolved_remote_sha256 = sums[path]
+                query.manifest.record(query.local_filename_from_remote(path),
+                                      'remote_sha256', sums[path])
+        missing = set(paths) - set(sums)
+        if missing:
+            complain("Batch remote sha256sum on {} failed for:".format(server),
+                     *sorted(missing))
+
+
+def with_remote_sha256_batches(queries, batch_size=REMOTE_HASH_BATCH_SIZE):
+    """Iterate through ``queries``, hashing the remote files of each batch of
+    ``batch_size`` queries that still need downloading with
+    ``remote_sha256_batch`` before yielding the queries in that batch."""
+    for i in range(0, len(queries), batch_size):
+        batch = queries[i:i+batch_size]
+        try:
+            remote_sha256_batch([q for q in batch
+                                 if not q.estimated_fullpath_exists()])
+        except Exception as e:
+            complain("Batch remote sha256sum failed; hashing one at a time:",
+                     e)
+        for query in batch:
+            yield query
+
+
 def check_progress(queries):
     """Return a dictionary of lists of queries, where the keys of the
     dictionary indicate the status of each query."""
@@ -706,27 +2745,26 @@ def check_progress(queries):
         'error':           []
     }
     for query in queries:
-        riders = query.estimated_rider_fullpaths()
-        if os.path.isfile(riders.local_sha256):
-            if os.path.isfile(riders.remote_sha256):
-                if filecmp.cmp(riders.local_sha256, riders.remote_sha256):
+        entry = query.manifest.lookup(query.estimated_filename)
+        if 'local_sha256' in entry:
+            if 'remote_sha256' in entry:
+                if entry['local_sha256'] == entry['remote_sha256']:
                     status['downloaded'].append(query)
                 else:
                     status['corrupted'].append(query)
             else:
                 status['maybe_corrupt'].append(query)
-        elif os.path.isfile(riders.remote_sha256):
+        elif 'remote_sha256' in entry:
             status['remote_hashed'].append(query)
-        elif os.path.isfile(riders.remote_url):
+        elif 'remote_url' in entry:
             status['remote_found'].append(query)
-        elif os.path.isfile(riders.query_repr):
+        elif 'query_repr' in entry:
             status['name_guessed'].append(query)
         else:
-            if os.path.isfile(riders.error_msg):
+            if 'error_msg' in entry:
                 status['error'].append(query)
-                with open(riders.error_msg) as f:
-                    lasterrmsg = f.readlines()[-1]
-                if lasterrmsg == 'Cannot get GPS start time from filename: \n':
+                lines = ''.join(entry['error_msg']).splitlines()
+                if lines[-1:] == ['Cannot get GPS start time from filename: ']:
                     status['no_remote_found'].append(query)
             else:
                 status['not_started'].append(query)
@@ -770,8 +2808,111 @@ def read_starts_and_deltats(infile):
     return [(int(start), int(stop)-int(start)) for start, stop in start_stops]
 
 
+def find_corrupt(outdir):
+    """Print the GWF files in ``outdir`` that the manifest does not show as
+    intact, along with the time since each was last modified."""
+    manifest = FrameManifest.get(outdir)
+    frames = sorted(f for f in os.listdir(outdir) if f.endswith('.gwf'))
+    for filename in manifest.corrupt_files(frames):
+        dt = time_since_file_modified(os.path.join(outdir, filename))
+        print('corrupt file, last mod t-{:.0f}:\t{}'.format(dt, filename))
+
+
+def percentiles(values, pcts=(50, 95)):
+    """Get the given percentiles of ``values`` as a list, or a list of
+    ``nan`` if ``values`` is empty."""
+    if not values:
+        return [float('nan')] * len(pcts)
+    return list(np.percentile(values, pcts))
+
+
+def transfer_stats(outdir):
+    """Print download statistics for ``outdir`` based on the timings recorded
+    in its manifest: throughput per server, median and 95th percentile times
+    for each phase of downloading a frame, and time lost to failed
+    attempts."""
+    timings = collections.defaultdict(list)
+    failures = collections.defaultdict(list)
+    for entry in FrameManifest.get(outdir).entries().values():
+        if 'timing' in entry:
+            timings[entry['timing']['server']].append(entry['timing'])
+        for attempt in entry.get('failed_attempt', []):
+            failures[attempt['server']].append(attempt)
+    fmt = '{: <32} {: >7} {: >9} {: >8} {: >15} {: >15} {: >8} {: >9}'
+    print(fmt.format('server', 'frames', 'MB', 'MB/s', 'transfer p50/95',
+                     'total p50/95', 'failures', 'lost [s]'))
+    for server in sorted(set(timings) | set(failures)):
+        done = timings[server]
+        nbytes = sum(t.get('bytes', 0) for t in done)
+        seconds = sum(t['transfer'] for t in done)
+        print(fmt.format(
+            server,
+            len(done),
+            '{:.1f}'.format(nbytes / 1e6),
+            '{:.2f}'.format(nbytes / 1e6 / seconds if seconds else 0),
+            '{:.1f}/{:.1f}'.format(*percentiles([t['transfer']
+                                                 for t in done])),
+            '{:.1f}/{:.1f}'.format(*percentiles([t['total'] for t in done])),
+            len(failures[server]),
+            '{:.0f}'.format(sum(a['lost'] for a in failures[server]))
+        ))
+    done = sum(timings.values(), [])
+    print('')
+    fmt = '{: <10} {: >8} {: >8} {: >8}'
+    print(fmt.format('phase [s]', 'mean', 'p50', 'p95'))
+    for phase in ('lookup', 'transfer', 'hash', 'total'):
+        values = [t[phase] for t in done if phase in t]
+        mean = sum(values) / len(values) if values else float('nan')
+        print(fmt.format(phase, *['{:.2f}'.format(v) for v in
+                                  [mean] + percentiles(values)]))
+
+
+def make_synthetic_frames(queries, nbytes):
+    """Create a file of ``nbytes`` bytes of random data for each query in the
+    ``LocalTransport`` frame tree rooted at the query's ``server``, laid out
+    like the frame directories on LIGO clusters, e.g.
+    ``{root}/H1_R/H-H1_R-11869/H-H1_R-1186959360-64.gwf``. Existing files are
+    left alone."""
+    created = 0
+    for query in queries:
+        prefix = str(query.gpstime)[:RemoteDirectoryIndex._SUBDIR_GPS_DIGITS]
+        subdir = '{}-{}-{}'.format(query.detector, query.frametype, prefix)
+        dirname = os.path.join(query.server, query.frametype, subdir)
+        path = os.path.join(dirname, query.estimated_filename)
+        if os.path.isfile(path):
+            continue
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(nbytes))
+        created += 1
+    complain("Created {} synthetic frames.".format(created))
+
+
 def main():
     complain("Arguments:", args)
+    if args.find_corrupt:
+        find_corrupt(args.outdir)
+        return
+    if args.stats:
+        transfer_stats(args.outdir)
+        return
+    if args.add_to_shared_index:
+        add_to_shared_index(args.outdir)
+        return
+    if args.watch is not None:
+        total = None
+        if args.start and args.deltat:
+            total = len(get_queries(
+                start=args.start,
+                deltat=args.deltat,
+                length=args.length,
+                h_frametypes=args.hanford_frametypes,
+                l_frametypes=args.livingston_frametypes,
+                v_frametypes=args.virgo_frametypes
+            ))
+        watch(args.watch or [args.outdir], args.watch_interval, total)
+        return
     if args.times:
         times = read_starts_and_deltats(sys.stdin)
     elif args.start and args.deltat:
@@ -779,21 +2920,37 @@ def main():
     else:
         raise ValueError("Must provide either ``times`` or both of ``start`` "
                          "and ``deltat``.")
+    # overlapping windows would otherwise produce duplicate queries
+    merged_times = merge_windows(times, args.length)
+    complain("Merged {} time windows into {}.".format(len(times),
+                                                      len(merged_times)))
+    if args.servers is None:
+        servers = [args.server]
+    else:
+        servers = args.servers or _TARGETED_SEARCH_SERVERS_CIT
+    if args.make_synthetic_frames is not None and TRANSPORT != 'local':
+        raise ValueError("Can only make synthetic frames for the ``local`` "
+                         "transport.")
     queries = sum(
         [
             get_queries(
                 start=start,
                 deltat=deltat,
                 length=args.length,
-                server=args.server,
+                server=servers[0],
                 outdir=args.outdir,
                 h_frametypes=args.hanford_frametypes,
                 l_frametypes=args.livingston_frametypes,
                 v_frametypes=args.virgo_frametypes
-            ) for start, deltat in times
+            ) for start, deltat in merged_times
         ],
         list()
     )
+    # keep remote reads sequential by fetching frames in time order
+    queries.sort(key=lambda q: (q.gpstime, q.detector, q.frametype))
+    if args.make_synthetic_frames is not None:
+        make_synthetic_frames(queries, args.make_synthetic_frames)
+        return
     complain("Queries:", *[format(q) for q in queries])
     complain("Total queries: ", len(queries))
     if args.progress:
@@ -802,25 +2959,44 @@ def main():
         if VERBOSE:
             complain("Checking progress before starting.")
             display_progress(check_progress(queries))
-        tries_left = args.retries
-        if tries_left >= 0:
-            tries_left += 1
-        while tries_left != 0:
-            try:
-                for query in queries:
-                    if not query.estimated_fullpath_exists():
-                        try:
-                            query.download()
-                        except FileNameParsingError:
-                            complain('Filename parse error, skipping:', query)
-            except Exception as err:
-                complain("Exception caught:", err)
-                if tries_left < 0:
-                    complain("Retrying. Will keep trying till interrupted.")
-                else:
-                    tries_left -= 1
-                    if tries_left != 0:
-                        complain("Retrying. Tries left: {}".format(tries_left))
+        # look up remote paths for all missing frames in a few big batches
+        resolve_remote_urls([q for q in queries
+                             if not q.estimated_fullpath_exists()])
+        # many queries might map to the same file if --length is wrong
+        queries = learn_frame_durations(queries)
+        # let --watch dashboards estimate an ETA
+        try:
+            ManifestWatcher.save_total(args.outdir, len(queries))
+        except (IOError, OSError) as e:
+            complain("Could not save the number of frames expected:", e)
+        if args.prioritize_triggers is not None:
+            if args.prioritize_triggers:
+                trigger_times = read_gstlal_trigger_times(
+                    args.prioritize_triggers)
+            else:
+                trigger_times = [start + deltat / 2.
+                                 for start, deltat in times]
+            complain("Prioritizing frames near {} triggers.".format(
+                len(trigger_times)))
+            if trigger_times:
+                queries = prioritize_triggers(queries, trigger_times)
+        # failures are retried after the main pass so that one flaky frame
+        # doesn't hold up (or force a rescan of) all of the others.
+        retry_queue = RetryQueue(args.retries)
+        if len(servers) > 1 or args.jobs_per_server > 1:
+            downloader = DownloadPool(queries, servers, args.jobs_per_server)
+        else:
+            downloader = DownloadPipeline(queries)
+        for query in downloader.run():
+            retry_queue.add(query)
+        # retrying can't fix these, but they still count as failures
+        retry_queue.failed += downloader.unparseable
+        if len(retry_queue):
+            complain("Retrying {} failed frames.".format(len(retry_queue)))
+        failed = retry_queue.run(download_if_missing)
+        if failed:
+            complain("{} frames could not be downloaded:".format(len(failed)),
+                     *failed)
         if VERBOSE:
             complain("Done. Checking progress at end:")
             display_progress(check_progress(queries))
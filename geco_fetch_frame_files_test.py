@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# (c) Stefan Countryman, 2018
+
+"""Check parts of ``geco_fetch_frame_files`` that don't need a remote server.
+Run directly or with ``pytest``."""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import geco_fetch_frame_files as gff
+
+# don't make the tests wait a minute between disk space checks
+gff.DISK_SPACE_POLL_INTERVAL = 0.05
+
+
+def write_file(path, nbytes):
+    """Write ``nbytes`` of zeros to ``path``."""
+    with open(path, 'wb') as f:
+        f.write(b'\0' * int(nbytes))
+
+
+def test_disk_space_guard_resumes_after_delete():
+    outdir = tempfile.mkdtemp()
+    try:
+        write_file(os.path.join(outdir, 'keep.gwf'), 1e6)
+        write_file(os.path.join(outdir, 'delete.gwf'), 3e6)
+        guard = gff.DiskSpaceGuard(outdir, min_free=1e6, quota=5e6)
+        reserved = threading.Event()
+
+        def reserve():
+            guard.reserve(1.5e6)
+            reserved.set()
+
+        thread = threading.Thread(target=reserve)
+        thread.daemon = True
+        thread.start()
+        time.sleep(0.3)
+        assert guard.paused and not reserved.is_set()
+        os.remove(os.path.join(outdir, 'delete.gwf'))
+        assert reserved.wait(5)
+        assert not guard.paused
+        assert guard.used == 1e6 and guard.reserved == 1.5e6
+    finally:
+        shutil.rmtree(outdir)
+
+
+def test_disk_space_guard_counts_partial_file_once():
+    outdir = tempfile.mkdtemp()
+    try:
+        part = os.path.join(outdir, 'frame.gwf.part')
+        write_file(part, 1e6)
+        guard = gff.DiskSpaceGuard(outdir, min_free=0, quota=10e6)
+        assert guard.available() == 9e6
+        guard.reserve(5e6, part, 1e6)
+        with open(part, 'ab') as f:
+            f.write(b'\0' * int(3e6))
+        # the 3 MB written are used, and 2 MB of the reservation remain
+        assert guard.available() == 6e6
+        assert guard.reserved - guard._written() == 2e6
+        guard.used = None
+        assert guard.available() == 6e6
+        guard.release(5e6, 3e6, part)
+        assert guard.available() == 6e6 and guard.reserved == 0
+    finally:
+        shutil.rmtree(outdir)
+
+
+if __name__ == "__main__":
+    for name, func in sorted(globals().items()):
+        if name.startswith('test_'):
+            func()
+            print('{} passed'.format(name))
@@ -30,6 +30,14 @@ SEC_PER = {
 # download in 5 minute chunks by default
 DEFAULT_MAX_CHUNK = SEC_PER['minutes'] * 5
 DEFAULT_PAD = -1.
+# spans within 3 hours of a focus time are downloaded before everything else
+DEFAULT_FOCUS_WINDOW = SEC_PER['minutes'] * 180
+# estimate download rates from files modified in the last 10 minutes, looking
+# at the modification times of at most this many files.
+RATE_WINDOW = SEC_PER['minutes'] * 10
+RATE_SAMPLE_SIZE = 200
+# seconds between progress updates when watching a running download
+WATCH_INTERVAL = 30
 INDEX_MISSING_FMT = ('{} index not found for segment {} of {}, time {}\n'
                      'Setting {} index to {}.')
 USAGE="""
@@ -45,6 +53,12 @@ Check incremental progress of download:
 
     geco_gwpy_dump -p
 
+Keep watching the progress of a running download, periodically printing a
+one-line summary of progress, download rate, and ETA until it is done (or
+interrupted):
+
+    geco_gwpy_dump -w
+
 List final output filenames and whether they exist or not:
 
     geco_gwpy_dump -o
@@ -93,6 +107,13 @@ available) with the ``-N`` flag:
 
     geco_gwpy_dump -N
 
+Download the spans surrounding an event of interest before the rest of the
+data with the ``-F`` flag, which can be given multiple times and takes any
+time readable by gwpy.time.to_gps (this is added to any "focus_times" in the
+jobspec; see below):
+
+    geco_gwpy_dump -F 1187008882 -F 'Aug 17 2017 12:41:04'
+
 Look for a file in the current directory called "jobspec.json", which is
 a dictionary containing "start", "end", "channels", and "trends" key-value
 pairs. The "start" and "end" values must merely be readable by
@@ -157,7 +178,20 @@ minute trends:
     ],
     "max_chunk_length": 3600
 }
-"""
+
+Set ``"segment_stats": true`` in the jobspec to fold each downloaded m-trend
+span into running per-DQ-segment statistics (count, sum, sum of squares, min,
+max) as the download proceeds. When the download finishes, the statistics are
+written to one file per DQ flag named like
+``START-END-H1..DMT-ANALYSIS_READY..1-segment-stats.hdf5`` in the same layout
+as the ``.stats.hdf5`` files used by ``geco_slow_channel_plot.py``, so no
+second pass over the data is needed to compute them.
+""" + """
+Set ``"focus_times"`` to a list of times (or of ``[start, end]`` pairs of
+times) to download the spans within ``"focus_window"`` seconds (DEFAULT: {})
+of those times first, closest spans first, before backfilling the rest of the
+job in the usual order.
+""".format(DEFAULT_FOCUS_WINDOW)
 # terminal color codes for pretty printing
 _GREEN = '\033[92m'
 _RED   = '\033[91m'
@@ -167,6 +201,7 @@ import sys
 # don't import the rest if someone just wants help
 if __name__ == '__main__':
     check_progress = False
+    watch_progress = False
     list_outfiles = False
     archive_outfiles = False
     unarchive_outfiles = False
@@ -186,6 +221,9 @@ if __name__ == '__main__':
     if '-p' in sys.argv:
         sys.argv.remove('-p')
         check_progress = True
+    if '-w' in sys.argv:
+        sys.argv.remove('-w')
+        watch_progress = True
     if '-o' in sys.argv:
         sys.argv.remove('-o')
         list_outfiles = True
@@ -204,10 +242,18 @@ if __name__ == '__main__':
     if '-N' in sys.argv:
         sys.argv.remove('-N')
         GETMETHOD = 'fetch'
+    focus_times = []
+    while '-F' in sys.argv:
+        f_opt_ind = sys.argv.index('-F')
+        if f_opt_ind + 1 == len(sys.argv):
+            sys.stderr.write('-F requires a focus time argument.\n')
+            exit(1)
+        focus_times.append(sys.argv[f_opt_ind + 1])
+        del sys.argv[f_opt_ind:f_opt_ind + 2]
 
 # slow import; only import if we are going to use it.
 if not (__name__ == '__main__'
-        and (check_progress or list_outfiles)):
+        and (check_progress or watch_progress or list_outfiles)):
     import gwpy.timeseries
     import gwpy.segments
 
@@ -215,6 +261,7 @@ import gwpy.time
 import numpy as np
 import json
 import functools
+import collections
 import hashlib
 import tarfile
 import tempfile
@@ -225,6 +272,7 @@ import os
 import logging
 import shutil
 import datetime
+import time
 
 
 class NDS2Exception(IOError):
@@ -264,6 +312,154 @@ def indices_to_intervals(inds):
     return intervals
 
 
+def trend_segment_bounds(start, end):
+    """Get the first and last minute-trend timestamps (inclusive) that belong
+    to a DQ segment running from ``start`` to ``end``. These are the same
+    boundaries used by ``Query.read_and_split_into_segments``."""
+    return (start // 60 * 60, end // 60 * 60 + 60)
+
+
+class SegmentStats(object):
+    """Running statistics (count, sum, sum of squares, min, max, and sum of
+    sample times) for a single channel in each of a list of DQ segments.
+    Partial results for individual timespans can be computed independently
+    (e.g. in worker processes) with ``partial`` and folded in with ``fold``,
+    so statistics are ready as soon as the last span has been downloaded."""
+
+    # same fields as ``geco_slow_channel_plot.TrendDataPlotter.Stats``
+    FIELDS = ['means', 'mins', 'maxs', 'stds', 'times', 'ns']
+
+    def __init__(self, segments):
+        """``segments`` is a list of ``[start, end]`` DQ segment GPS times."""
+        self.segments = [ list(seg) for seg in segments ]
+        nsegs = len(self.segments)
+        self.count = np.zeros(nsegs, dtype=int)
+        self.sum = np.zeros(nsegs)
+        self.sumsq = np.zeros(nsegs)
+        self.min = np.full(nsegs, np.inf)
+        self.max = np.full(nsegs, -np.inf)
+        self.tsum = np.zeros(nsegs)
+
+    @staticmethod
+    def partial(segments, times, values):
+        """Calculate the contribution of a single timespan with sample
+        ``times`` and ``values`` to each of the ``segments``. Returns a tuple
+        of ``(indices, count, sum, sumsq, min, max, tsum)`` lists, where
+        ``indices`` are the indices of the segments that overlap with this
+        timespan."""
+        times = np.asarray(times, dtype=float)
+        values = np.asarray(values, dtype=float)
+        partial = ([], [], [], [], [], [], [])
+        if len(times) == 0:
+            return partial
+        for i, (start, end) in enumerate(segments):
+            lo, hi = trend_segment_bounds(start, end)
+            if hi < times[0] or lo > times[-1]:
+                continue
+            i_lo = np.searchsorted(times, lo, side='left')
+            i_hi = np.searchsorted(times, hi, side='right')
+            if i_hi <= i_lo:
+                continue
+            vals = values[i_lo:i_hi]
+            for lst, val in zip(partial, [i, len(vals), vals.sum(),
+                                          (vals**2).sum(), vals.min(),
+                                          vals.max(), times[i_lo:i_hi].sum()]):
+                lst.append(val)
+        return partial
+
+    def fold(self, partial):
+        """Fold a partial result returned by ``SegmentStats.partial`` into the
+        running statistics."""
+        inds, count, total, sumsq, mins, maxs, tsum = partial
+        if len(inds) == 0:
+            return
+        inds = np.array(inds, dtype=int)
+        self.count[inds] += count
+        self.sum[inds] += total
+        self.sumsq[inds] += sumsq
+        self.min[inds] = np.minimum(self.min[inds], mins)
+        self.max[inds] = np.maximum(self.max[inds], maxs)
+        self.tsum[inds] += tsum
+
+    def stats(self):
+        """Return a dictionary of arrays with the same fields as
+        ``geco_slow_channel_plot.TrendDataPlotter.Stats``. Segments without
+        any data get NaN for everything except ``ns``, which is zero."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sum / self.count
+            variances = np.maximum(self.sumsq / self.count - means**2, 0.)
+            empty = self.count == 0
+            return {
+                'means': means,
+                'mins':  np.where(empty, np.nan, self.min),
+                'maxs':  np.where(empty, np.nan, self.max),
+                'stds':  np.sqrt(variances),
+                'times': self.tsum / self.count,
+                'ns':    self.count.copy()
+            }
+
+
+class DirectoryListing(object):
+    """A snapshot of the filenames in a directory, taken with a single
+    directory scan so that checking whether many files exist does not require
+    a ``stat`` call for each file (which can be very slow on network
+    filesystems). Modification times are only looked up (and cached) when
+    explicitly requested. Call ``refresh`` to scan the directory again while
+    keeping the cached modification times of files that are still there."""
+
+    def __init__(self, path='.'):
+        self.path = path
+        self._entries = dict()
+        self._mtimes = dict()
+        self._scan()
+
+    def _scan(self):
+        self._entries = dict()
+        if hasattr(os, 'scandir'):
+            for entry in os.scandir(self.path):
+                self._entries[entry.name] = entry
+        else:
+            for name in os.listdir(self.path):
+                self._entries[name] = None
+
+    def refresh(self):
+        """Scan the directory again, returning a list of the names that have
+        appeared since the last scan."""
+        old = self._entries
+        self._scan()
+        for name in set(self._mtimes) - set(self._entries):
+            del self._mtimes[name]
+        return [name for name in self._entries if not name in old]
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def mtime(self, name):
+        """Get the modification time of the file called ``name``."""
+        if not name in self._mtimes:
+            entry = self._entries[name]
+            if entry is None:
+                mtime = os.path.getmtime(os.path.join(self.path, name))
+            else:
+                mtime = entry.stat().st_mtime
+            self._mtimes[name] = mtime
+        return self._mtimes[name]
+
+    def rate(self, names, window=RATE_WINDOW, sample_size=RATE_SAMPLE_SIZE):
+        """Estimate the rate (in files per second) at which the files in
+        ``names`` have been created over the last ``window`` seconds. Only a
+        sample of at most ``sample_size`` evenly-spaced files is checked."""
+        if len(names) == 0:
+            return 0.
+        sample = names[::max(1, len(names) // sample_size)]
+        cutoff = time.time() - window
+        recent = len([n for n in sample if self.mtime(n) > cutoff])
+        return recent * len(names) / float(len(sample)) / window
+
+
 class Query(object):
     """A channel and timespan for a single NDS query and save operation."""
 
@@ -494,12 +690,19 @@ class Query(object):
 
     # must be a staticmethod so that we can use multiprocessing on it
     @staticmethod
-    def _download_data_if_missing(query, getmethod='get'):
+    def _download_data_if_missing(query, getmethod='get', segments=None):
         """download missing data if necessary. the query contains start, end,
         channel name, and file extension information in the following format:
             [ [start, end], channel, ext ]
         Specify whether ``fetch`` or ``get`` from gwpy should be used by
-        passing the ``getmethod`` kwargument."""
+        passing the ``getmethod`` kwargument.
+
+        If ``segments`` is a dictionary mapping DQ flag names to lists of
+        ``[start, end]`` active segments, return a dictionary mapping
+        ``(dq_flag, channel)`` tuples to ``SegmentStats.partial`` results for
+        this query's data (reading the data from file if it was downloaded
+        previously). Otherwise, return ``None``."""
+        data = None
         # only download the data if the file doesn't already exist
         logging.debug(("running query: {}, \nchecking "
                        "if file exists: {}").format(repr(query), query.fname))
@@ -522,17 +725,31 @@ class Query(object):
                                            query.end, e))
                 with open(query.fname_err, 'w') as f:
                     f.write('Download failed: {}'.format(e))
-
-    def download_data_if_missing(self, getmethod='get'):
+                data = None
+        if segments is None or not 'm-trend' in query.trend:
+            return None
+        if data is None:
+            if not query.file_exists():
+                return None
+            data = query.read()
+        times = data.times.value
+        values = data.value
+        return { (flag, query.channel): SegmentStats.partial(segments[flag],
+                                                             times, values)
+                 for flag in segments }
+
+    def download_data_if_missing(self, getmethod='get', segments=None):
         """download missing data if necessary. the query contains start, end,
         channel name, and file extension information in the following format:
             [ [start, end], channel, ext ]"""
-        _download_data_if_missing(self, getmethod=getmethod)
+        return _download_data_if_missing(self, getmethod=getmethod,
+                                         segments=segments)
 
 
-def _download_data_if_missing(query, getmethod='get'):
+def _download_data_if_missing(query, getmethod='get', segments=None):
     """Must define this at Global level to allow for multiprocessing"""
-    Query._download_data_if_missing(query, getmethod=getmethod)
+    return Query._download_data_if_missing(query, getmethod=getmethod,
+                                           segments=segments)
 
 
 class Job(object):
@@ -544,10 +761,17 @@ class Job(object):
 
     def __init__(self, start, end, channels, exts=DEFAULT_EXTENSION,
                  dq_flags=DEFAULT_FLAGS, trends=DEFAULT_TRENDS,
-                 max_chunk_length=DEFAULT_MAX_CHUNK, filename=None):
+                 max_chunk_length=DEFAULT_MAX_CHUNK, filename=None,
+                 segment_stats=False, focus_times=(),
+                 focus_window=DEFAULT_FOCUS_WINDOW):
         """Start and end times can be specified as either integer GPS times or
         as human-readable time strings that are parsable by gwpy.time.to_gps.
         max_chunk_length is measured in seconds and must be a multiple of 60.
+        If ``segment_stats`` is ``True``, per-DQ-segment statistics will be
+        accumulated for m-trend channels while the data is downloaded.
+        ``focus_times`` is a list of times or ``[start, end]`` pairs of times;
+        spans within ``focus_window`` seconds of any of these are downloaded
+        first (see ``prioritized_queries``).
         """
         if not set(exts).issubset(ALLOWED_EXTENSIONS):
             raise ValueError(('Must pick saved data file extension from: '
@@ -567,6 +791,9 @@ class Job(object):
         self.dq_flags           = dq_flags
         self.max_chunk_length   = max_chunk_length
         self.filename           = filename
+        self.segment_stats      = segment_stats
+        self.focus_times        = [ _focus_interval(t) for t in focus_times ]
+        self.focus_window       = focus_window
         # if minute-trends are being downloaded, expand the interval so
         # that start and end times are divisible by 60.
         if any(['m-trend' in c for c in self.channels_with_trends]):
@@ -584,7 +811,8 @@ class Job(object):
         # there are some optional parameters that we will only pass to the
         # __init__ method if they are included in the JSON.
         kwargs = {}
-        for optional_key in ['dq_flags', 'exts', 'trends', 'max_chunk_length']:
+        for optional_key in ['dq_flags', 'exts', 'trends', 'max_chunk_length',
+                             'segment_stats', 'focus_times', 'focus_window']:
             if optional_key in d:
                 kwargs[optional_key] = d[optional_key]
         # start and end cannot be unicode strings because GWpy complains
@@ -616,7 +844,10 @@ class Job(object):
                  'exts':                self.exts,
                  'dq_flags':            self.dq_flags,
                  'trends':              self.trends,
-                 'max_chunk_length':    self.max_chunk_length }
+                 'max_chunk_length':    self.max_chunk_length,
+                 'segment_stats':       self.segment_stats,
+                 'focus_times':         self.focus_times,
+                 'focus_window':        self.focus_window }
 
     def save(self, jobspecfile):
         """Write this job specification to a JSON file named
@@ -689,6 +920,32 @@ class Job(object):
                     for span in self.subspans 
                     for ext  in self.exts ]
 
+    def focus_distance(self, query):
+        """Get the distance in seconds between the timespan of ``query`` and
+        the nearest of this job's ``focus_times`` (zero if they overlap).
+        Returns ``None`` if this job has no ``focus_times``."""
+        distances = [ max(0, query.start - end, start - query.end)
+                      for start, end in self.focus_times ]
+        if len(distances) == 0:
+            return None
+        return min(distances)
+
+    @property
+    def prioritized_queries(self):
+        """Return the same Queries as ``queries``, but with the ones within
+        ``focus_window`` seconds of any of the ``focus_times`` moved to the
+        front (ordered by distance from the nearest focus time, with ties
+        broken by the usual order). The remaining queries follow in the usual
+        channel-major order."""
+        queries = self.queries
+        distances = [ self.focus_distance(q) for q in queries ]
+        focused = [ i for i, d in enumerate(distances)
+                    if d is not None and d <= self.focus_window ]
+        focused.sort(key=lambda i: distances[i])
+        focused_set = set(focused)
+        return ([ queries[i] for i in focused ] +
+                [ q for i, q in enumerate(queries) if not i in focused_set ])
+
     @property
     def full_queries(self):
         """Return a list of Queries corresponding to each channel/trend
@@ -704,7 +961,10 @@ class Job(object):
         for each which, when combined, are equivalent to the total job.."""
         return [ type(self)(self.start, self.end, [chan], exts = [ext], 
                             dq_flags = self.dq_flags, trends = [trend],
-                            max_chunk_length = self.max_chunk_length)
+                            max_chunk_length = self.max_chunk_length,
+                            segment_stats = self.segment_stats,
+                            focus_times = self.focus_times,
+                            focus_window = self.focus_window)
                     for chan in self.channels
                     for ext in self.exts
                     for trend in self.trends ]
@@ -731,11 +991,14 @@ class Job(object):
     def __repr__(self):
         fmt = (type(self).__name__
                + '(start={}, end={}, channels={}, exts={}, dq_flags={}, '
-               +  'trends={}, max_chunk_length={})')
+               +  'trends={}, max_chunk_length={}, segment_stats={}, '
+               +  'focus_times={}, focus_window={})')
         return fmt.format(repr(self.start), repr(self.end),
                           repr(self.channels), repr(self.exts),
                           repr(self.dq_flags), repr(self.trends),
-                          repr(self.max_chunk_length))
+                          repr(self.max_chunk_length),
+                          repr(self.segment_stats), repr(self.focus_times),
+                          repr(self.focus_window))
 
     @property
     def output_filenames(self):
@@ -804,12 +1067,14 @@ class Job(object):
         print('You can check whether the final outputs of this job have been')
         print('downloaded by using the -o flag.' + _CLEAR)
         print('{}Total downloads needed:{} {}'.format(_GREEN, _CLEAR, n_tot))
-        successful = filter(lambda q: q.file_exists(), queries)
+        # look at the directory once instead of checking each file
+        listing = DirectoryListing()
+        successful = [ q for q in queries if q.fname in listing ]
         successful_percentage = len(successful) * 100. / n_tot
         print('{}Successful downloads{}: {}'.format(_GREEN, _CLEAR,
                                                     len(successful)))
-        not_done = filter(lambda q: not q.file_exists(), queries)
-        failed = filter(lambda q: q.query_failed(), not_done)
+        failed = [ q for q in queries
+                   if not q.fname in listing and q.fname_err in listing ]
         failed_percentage = len(failed) * 100. / n_tot
         print('{}Failed downloads{}: {}'.format(_GREEN, _CLEAR,
                                                 len(failed)))
@@ -817,13 +1082,61 @@ class Job(object):
         print('{}Failed timespans{}:'.format(_GREEN, _CLEAR))
         for f in failed_times:
             print('    {}'.format(f))
-        in_progress = filter(lambda q: not q.query_failed(), not_done)
-        in_progress_percentage = len(in_progress) * 100. / n_tot
+        n_in_progress = n_tot - len(successful) - len(failed)
+        in_progress_percentage = n_in_progress * 100. / n_tot
         print('{}In progress downloads{}: {}'.format(_GREEN, _CLEAR,
-                                                     len(in_progress)))
+                                                     n_in_progress))
         summary_fmt = '{}SUMMARY{}:\n{}% done\n{}% failed\n{}% remains'
         print(summary_fmt.format(_GREEN, _CLEAR, successful_percentage,
                                  failed_percentage, in_progress_percentage))
+        # failed queries are finished too, as far as the rate is concerned
+        rate = listing.rate([q.fname for q in successful] +
+                            [q.fname_err for q in failed])
+        print('{}Rate over last {} minutes{}: {:.3f} files/minute'.format(
+            _GREEN, int(RATE_WINDOW / SEC_PER['minutes']), _CLEAR,
+            rate * SEC_PER['minutes']))
+        print('{}ETA{}: {}'.format(_GREEN, _CLEAR, _eta(n_in_progress, rate)))
+
+    def watch_progress(self, interval=WATCH_INTERVAL):
+        """Print a one-line summary of the progress of this download every
+        ``interval`` seconds until there is nothing left to download. The
+        queries are only generated once, and each update only rescans the
+        directory's filenames and looks up the modification times of output
+        files that have appeared since the last update, so this is cheap
+        enough to leave running alongside the download. Until it has been
+        watching for ``RATE_WINDOW`` seconds, the rate also counts a sample of
+        the files that were already finished when it started."""
+        queries = self.queries
+        n_tot = len(queries)
+        outputs = set([q.fname for q in queries] +
+                      [q.fname_err for q in queries])
+        listing = DirectoryListing()
+        initial_rate = listing.rate([n for n in outputs if n in listing])
+        started = time.time()
+        finish_times = collections.deque()
+        while True:
+            successful = [q.fname for q in queries if q.fname in listing]
+            failed = [q.fname_err for q in queries
+                      if not q.fname in listing and q.fname_err in listing]
+            n_in_progress = n_tot - len(successful) - len(failed)
+            now = time.time()
+            while finish_times and finish_times[0] < now - RATE_WINDOW:
+                finish_times.popleft()
+            before = max(RATE_WINDOW - (now - started), 0)
+            rate = (initial_rate * before / RATE_WINDOW +
+                    len(finish_times) / float(RATE_WINDOW))
+            print('[{}] {}/{} done, {} failed, {:.3f} files/minute, ETA: '
+                  '{}'.format(datetime.datetime.now().strftime('%H:%M:%S'),
+                              len(successful), n_tot, len(failed),
+                              rate * SEC_PER['minutes'],
+                              _eta(n_in_progress, rate)))
+            sys.stdout.flush()
+            if n_in_progress == 0:
+                return
+            time.sleep(interval)
+            finish_times.extend(sorted(listing.mtime(n)
+                                       for n in listing.refresh()
+                                       if n in outputs))
 
     def list_outfiles(self):
         """List output filenames (i.e. the files that should be produced once
@@ -831,8 +1144,9 @@ class Job(object):
         they exist or not in a human-readable format."""
         does_exist = '[{} EXISTS {}] '.format(_GREEN, _CLEAR)
         does_not_exist = '[{} MISSING {}]'.format(_RED, _CLEAR)
+        listing = DirectoryListing()
         for f in self.output_filenames:
-            if os.path.isfile(f):
+            if f in listing:
                 exists = does_exist
             else:
                 exists = does_not_exist
@@ -986,21 +1300,96 @@ class Job(object):
             segs.pop(extraneous_key)
         return segs
 
+    def active_segment_times(self):
+        """Get a dictionary mapping each of this job's DQ flags to a list of
+        ``[start, end]`` GPS times of that flag's active segments."""
+        segs = self.get_dq_segments()
+        return { flag: [ [gwpy.time.to_gps(seg.start).gpsSeconds,
+                          gwpy.time.to_gps(seg.end).gpsSeconds]
+                         for seg in segs[flag].active ]
+                 for flag in self.dq_flags }
+
+    def segment_stats_filename(self, dq_flag):
+        """The filename of the HDF5 file holding per-segment statistics for
+        each m-trend channel in this job during active segments of
+        ``dq_flag``. The layout is the same as that of the ``.stats.hdf5``
+        files used by ``geco_slow_channel_plot.TrendDataPlotter``."""
+        return "{}-{}-{}-segment-stats.hdf5".format(
+            self.start, self.end, sanitize_for_filename(dq_flag))
+
+    def save_segment_stats(self, accumulators):
+        """Save the ``SegmentStats`` in ``accumulators``, a dictionary keyed by
+        ``(dq_flag, channel)`` tuples, to one file per DQ flag."""
+        import h5py
+        for dq_flag in self.dq_flags:
+            fname = self.segment_stats_filename(dq_flag)
+            with h5py.File(fname, 'w') as f:
+                for (flag, channel), acc in accumulators.items():
+                    if flag != dq_flag:
+                        continue
+                    grp = f.create_group(channel)
+                    for field, value in acc.stats().items():
+                        grp.create_dataset(field, data=value)
+            logging.info('saved segment statistics to {}'.format(fname))
+
 
 def _run_queries(job, multiproc=False, getmethod='get'):
     """Try to download all data, i.e. run all queries. Can use multiple
     processes to try to improve I/O performance, though by default, only
     runs in a single process. Must define this at the global level to allow
-    for multiprocessing."""
+    for multiprocessing. If the job has ``segment_stats`` enabled, fold each
+    query's data into per-segment statistics as it arrives and save them once
+    all queries have been run."""
     if multiproc:
-        mapf = multiprocessing.Pool(processes=NUM_THREADS).map
+        mapf = multiprocessing.Pool(processes=NUM_THREADS).imap_unordered
     else:
         mapf = map
     kwargs = {"getmethod": getmethod}
-    mapf(functools.partial(_download_data_if_missing, **kwargs), job.queries)
+    accumulators = None
+    if job.segment_stats:
+        segments = job.active_segment_times()
+        kwargs["segments"] = segments
+        accumulators = { (flag, chan): SegmentStats(segments[flag])
+                         for flag in segments
+                         for chan in job.channels_with_trends
+                         if 'm-trend' in chan }
+    # spans near the job's focus times go first; pool workers take queries one
+    # at a time in this order.
+    results = mapf(functools.partial(_download_data_if_missing, **kwargs),
+                   job.prioritized_queries)
+    for partials in results:
+        if partials is None or accumulators is None:
+            continue
+        for key in partials:
+            accumulators[key].fold(partials[key])
+    if accumulators is not None:
+        job.save_segment_stats(accumulators)
     logging.info('done downloading data.')
 
 
+def _eta(remaining, rate):
+    """Get a human-readable estimate of the time needed to download
+    ``remaining`` files at ``rate`` files per second."""
+    if remaining == 0:
+        return 'done'
+    if rate == 0:
+        return 'unknown (no recent downloads)'
+    return str(datetime.timedelta(seconds=int(remaining / rate)))
+
+
+def _focus_interval(focus_time):
+    """Convert a focus time (anything readable by ``gwpy.time.to_gps``) or a
+    ``[start, end]`` pair of focus times into a ``[start, end]`` pair of GPS
+    seconds."""
+    if isinstance(focus_time, (list, tuple)):
+        start, end = focus_time
+    else:
+        start = end = focus_time
+    # GWpy complains about unicode time strings (e.g. from JSON)
+    return [ gwpy.time.to_gps(t if isinstance(t, (int, float)) else str(t))
+             .gpsSeconds for t in (start, end) ]
+
+
 def sanitize_for_filename(string):
     """Take some string and return a sanitized filename with offensive
     characters (colons and commas) replaced with innocuous characters.
@@ -1041,11 +1430,14 @@ if __name__ == '__main__':
                         level=logging.DEBUG,
                         format='%(asctime)s - %(levelname)s - %(message)s')
     job = Job.load(jobspecfile)
+    job.focus_times += [ _focus_interval(t) for t in focus_times ]
     # see if we are supposed to do something besides download the data
     # (argparse is used at the start of the script to set these variables based
     # on command line arguments passed in)
     if check_progress:
         job.current_progress()
+    if watch_progress:
+        job.watch_progress()
     if list_outfiles:
         job.list_outfiles()
     if archive_outfiles:
@@ -1056,8 +1448,8 @@ if __name__ == '__main__':
         job.output_unarchive()
     if print_archive_filename:
         print(job.output_archive_filename)
-    if (check_progress or list_outfiles or archive_outfiles or
-            unarchive_outfiles or print_archive_filename):
+    if (check_progress or watch_progress or list_outfiles or
+            archive_outfiles or unarchive_outfiles or print_archive_filename):
         exit(0)
     logging.debug('job after gps conversion: {}'.format(job.to_dict()))
     logging.debug('all spans: {}'.format(job.subspans))
@@ -1,35 +1,58 @@
 #!/usr/bin/env python
 # (c) Stefan Countryman, 2016-2017
 
+DESC = """Read a raw IRIG-B signal and print out decoded timestamps, one per
+second. Sample rate must be 16,384 (2^14) Hz. The input must contain an integer
+number of seconds worth of data, i.e. it must have (Sample Rate) x (N) values,
+where N is the number of seconds that must be decoded, and the data must start
+at the beginning of a second. By default, data is read from STDIN as a
+whitespace-delimited (e.g. newline-delimited) list of floating point values
+representing the value of the IRIG-B signal at each point in time; raw binary
+samples and ``.npy`` files can be read much faster (see ``--format``). Use
+``--stream`` to decode input of any length and alignment, e.g. a long
+recording with dropouts."""
+# formats that timeseries can be read in; "npy" only works for files.
+INPUT_FORMATS = ('text', 'float32', 'float64', 'int16', 'npy')
+
+# THE REST OF THE IMPORTS ARE AFTER THIS IF STATEMENT.
+# Quits immediately on --help or -h flags to skip slow imports when you just
+# want to read the help documentation.
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=DESC)
+    parser.add_argument("infile", nargs="?",
+                        help=("file to read the IRIG-B signal from; raw binary "
+                              "and .npy files are memory-mapped. DEFAULT: read "
+                              "from STDIN"))
+    parser.add_argument("-f", "--format", choices=INPUT_FORMATS,
+                        default='text',
+                        help=("format of the input: text, raw native-endian "
+                              "binary samples of the given type (e.g. dumped "
+                              "with numpy's ``tofile``), or a .npy file saved "
+                              "with ``numpy.save``. DEFAULT: %(default)s"))
+    parser.add_argument("-s", "--stream", action="store_true",
+                        help=("synchronize to the signal instead of assuming "
+                              "the input starts at the beginning of a second, "
+                              "skipping seconds that cannot be decoded. Each "
+                              "timestamp is preceded by the index of the first "
+                              "sample of that second and a tab."))
+    args = parser.parse_args()
+
 import sys
 from datetime import datetime, timedelta
-from textwrap import fill
 import numpy as np
 # import scipy.ndimage.filters as scf
 
-if __name__ == "__main__" and len(sys.argv) > 1:
-    print(
-        "Usage: {} <input_file.txt\n\n".format(sys.argv[0]) +
-        fill(
-            """Read a raw IRIG-B signal from STDIN and print out decoded
-            timestamps.  Data must be a newline-delimited list of floating
-            point values representing the value of the IRIG-B signal at each
-            point in time.  Sample rate must be 16,384 (2^14) Hz. The input
-            file must contain an integer number of seconds worth of data, i.e.
-            it must have (Sample Rate) x (N) values, where N is the number of
-            seconds that must be decoded, and the data must start at the
-            beginning of a second.
-            """
-        )
-    )
-    exit(1)
-
 # ------------------------------------------------------------------------------
 # CONSTANTS
 # ------------------------------------------------------------------------------
 
 # max and min of histogram, and number of bins
 SAMPLE_RATE = 16384     # ADC sample rate
+# seconds of input to read and decode at a time
+CHUNK_SECONDS = 64
+# characters of text input to parse at a time
+TEXT_BLOCK_SIZE = 2**22
 
 # --------------------------------------------------------------------------
 # IRIG-B RELATED CONSTANTS
@@ -46,6 +69,8 @@ TEST_POINTS = np.array([20, 60, 110, 150])
 # find the start of each bit
 BIT_STARTS = np.round(np.arange(0, 1, 1./BITS_PER_SECOND) * SAMPLE_RATE)
 ALL_TEST_POINT_INDICES = (BIT_STARTS[:, np.newaxis] + TEST_POINTS).astype(int)
+# length of the last bit, which ends at the start of the next second
+LAST_BIT_LENGTH = SAMPLE_RATE - int(BIT_STARTS[-1])
 
 # representations of each type of bit (0, 1, or control)
 REP_0 = [1, 0, 0, 0]
@@ -110,46 +135,91 @@ control_bits = np.zeros(BITS_PER_SECOND, dtype=bool)
 control_bits[range(9,100,10)] = True
 control_bits[0] = True
 
+# pack the high/low values at the 4 test points of a bit into a single number
+# (first test point in the highest bit) so that bits can be classified with a
+# lookup table; patterns matching no type of bit are marked with -1
+PATTERN_WEIGHTS = np.array([8, 4, 2, 1])
+BIT_LOOKUP = np.full(2**len(TEST_POINTS), -1, dtype=int)
+BIT_LOOKUP[np.dot(REP_0, PATTERN_WEIGHTS)] = 0
+BIT_LOOKUP[np.dot(REP_1, PATTERN_WEIGHTS)] = 1
+BIT_LOOKUP[np.dot(REP_C, PATTERN_WEIGHTS)] = 2
+
+# decoded fields and the value of each bit for each of them, one column each
+FIELDS = ('second', 'minute', 'hour', 'day', 'year')
+FIELD_WEIGHTS = np.column_stack([SECONDS, MINUTES, HOURS, DAYS, YEARS])
+
 #-------------------------------------------------------------------------------
 # UTILITY FUNCTIONS
 #-------------------------------------------------------------------------------
 
+def decode_bits(timeseries):
+    """Classify every bit in a timeseries containing an integer number of
+    seconds of IRIG-B signal. Returns an (N, 100) array of bits for the N
+    seconds, with 0 and 1 for data bits, 2 for control bits, and -1 for bits
+    that look like none of these."""
+    timeseries = np.asarray(timeseries)
+    if timeseries.size % SAMPLE_RATE:
+        raise ValueError("Timeseries has {} samples, which is not an integer "
+                         "number of seconds.".format(timeseries.size))
+    seconds = timeseries.reshape(-1, SAMPLE_RATE)
+    # check all test points of all bits in all seconds at once
+    bits_high = seconds[:, ALL_TEST_POINT_INDICES] >= HIGH_SIGNAL_THRESHOLD
+    return BIT_LOOKUP[bits_high.astype(int).dot(PATTERN_WEIGHTS)]
+
+def decode_timeseries_batch(timeseries):
+    """Decode N seconds of IRIG-B signal at once from an (N, 16384) array (or
+    a flat array of N*16384 samples) starting at the beginning of a second.
+    Returns a dictionary of length-N arrays with the same keys as
+    ``decode_timeseries``, where ``datetime`` is a ``numpy.datetime64``
+    array, as well as the ``bits`` from ``decode_bits`` and a boolean
+    ``valid`` array that is ``False`` for seconds with bad bits or misplaced
+    control bits. Decoded values for invalid seconds are meaningless, and
+    their datetimes are ``NaT``."""
+    bits = decode_bits(timeseries)
+    valid = (np.all(bits >= 0, axis=1) &
+             np.all((bits == 2) == control_bits, axis=1))
+
+    # find total seconds, minutes, hours, days, and years
+    values = (bits == 1).astype(int).dot(FIELD_WEIGHTS)
+    decoded = dict(zip(FIELDS, values.T))
+    decoded['year'] = decoded['year'] + 100*CURRENT_CENTURY
+    decoded['bits'] = bits
+    decoded['valid'] = valid
+
+    # parse datetimes from this
+    jan1 = (decoded['year'] - 1970).astype('datetime64[Y]')
+    days = (decoded['day'] - 1).astype('timedelta64[D]')
+    secs = (3600*decoded['hour'] + 60*decoded['minute'] +
+            decoded['second']).astype('timedelta64[s]')
+    datetimes = jan1.astype('datetime64[D]') + days + secs
+    datetimes[~valid] = np.datetime64('NaT')
+    decoded['datetime'] = datetimes
+
+    return decoded
+
 def decode_timeseries(timeseries):
     """Return the full decoded information as a dictionary along with a decoded
     datetime object for more convenient manipulation."""
     # filter the timeseries to remove ringing at corners
     # filt = scf.gaussian_filter1d(timeseries, CONVOLUTION_SIGMA * SAMPLE_RATE)
-
-    # check all test points
-    bits_high = (timeseries[ALL_TEST_POINT_INDICES] >= HIGH_SIGNAL_THRESHOLD).astype(int)
-
-    # represent control bits with the number 2
-    bits = np.zeros(BITS_PER_SECOND, dtype=int)
-    for i in range(bits_high.shape[0]):
-        if   np.all(bits_high[i] == REP_0): bits[i] = 0
-        elif np.all(bits_high[i] == REP_1): bits[i] = 1
-        elif np.all(bits_high[i] == REP_C): bits[i] = 2
-        else: raise ValueError("Bad bit: " + str(i))
+    batch = decode_timeseries_batch(np.asarray(timeseries)[:SAMPLE_RATE])
+    bits = batch['bits'][0]
+    bad_bits = np.flatnonzero(bits < 0)
+    if len(bad_bits):
+        raise ValueError("Bad bit: " + str(bad_bits[0]))
 
     # are the control bits in the correct spots?
-    if not np.all((bits == 2) == control_bits):
+    if not batch['valid'][0]:
         raise ValueError("Control bits are not present where expected: \n"
                         + str((bits == 2) == control_bits))
 
-    # find total seconds, minutes, hours, days, and years
-    decoded = {
-        'second': bits.dot(SECONDS),
-        'minute': bits.dot(MINUTES),
-        'hour': bits.dot(HOURS),
-        'day': bits.dot(DAYS),
-        'year': bits.dot(YEARS) + 100*CURRENT_CENTURY,
-    }
-
-    # parse a datetime from this
-    jan1 = datetime(decoded['year'], 1, 1, decoded['hour'], decoded['minute'],
-                    decoded['second'])
-    decoded['datetime'] = jan1 + timedelta(decoded['day'] - 1)
+    return _decoded_second(batch, 0)
 
+def _decoded_second(batch, i):
+    """Get the ``decode_timeseries`` dictionary for second ``i`` of the
+    output of ``decode_timeseries_batch``."""
+    decoded = dict((field, int(batch[field][i])) for field in FIELDS)
+    decoded['datetime'] = batch['datetime'][i].astype(datetime)
     return decoded
 
 def get_date_from_timeseries(timeseries):
@@ -157,35 +227,209 @@ def get_date_from_timeseries(timeseries):
     IRIG-B signal using DCLS (DC Level Shift)."""
     return decode_timeseries(timeseries)['datetime']
 
+def _bit_types(bits_high, starts):
+    """Classify the bits starting at indices ``starts`` of the boolean array
+    ``bits_high`` (see ``decode_bits``)."""
+    patterns = bits_high[starts[:, np.newaxis] + TEST_POINTS]
+    return BIT_LOOKUP[patterns.astype(int).dot(PATTERN_WEIGHTS)]
+
+def _find_frame_starts(bits_high, start, stop):
+    """Find candidates for the start of a second between indices ``start``
+    and ``stop`` of the boolean array ``bits_high``, i.e. rising edges that
+    start the frame reference marker: a control bit (bit 0 of the second)
+    preceded by another control bit (bit 99 of the previous second, if the
+    data goes back that far)."""
+    edges = np.flatnonzero(bits_high[start:stop]) + start
+    # keep rising edges, counting a high first sample as one
+    edges = edges[(edges == 0) | ~bits_high[np.maximum(edges - 1, 0)]]
+    edges = edges[edges + TEST_POINTS[-1] < len(bits_high)]
+    edges = edges[_bit_types(bits_high, edges) == 2]
+    previous = edges - LAST_BIT_LENGTH
+    has_previous = previous >= 0
+    previous_control = _bit_types(bits_high, np.maximum(previous, 0)) == 2
+    return edges[~has_previous | previous_control]
+
+def decode_stream(chunks):
+    """Decode an IRIG-B signal of any length that need not start at the
+    beginning of a second, given as an iterable of 1D sample arrays of any
+    length (e.g. from ``read_timeseries_chunks``). A generator yielding
+    ``(offset, decoded)`` tuples for each second that can be decoded, where
+    ``offset`` is the index of the first sample of that second in the whole
+    stream and ``decoded`` is the output of ``decode_timeseries``.
+
+    The decoder synchronizes to the frame reference marker (control bits in
+    positions 99 and 0) and then decodes whole seconds in batches, carrying
+    partial seconds over to the next chunk. Seconds that fail to decode
+    (glitches, dropouts, or a slipped alignment) are skipped, and the decoder
+    searches for the next frame reference marker to resynchronize."""
+    buf = np.zeros(0)
+    offset = 0      # index in the stream of the first sample in buf
+    pos = 0         # index in buf to resume decoding or searching from
+    synced = False
+    for chunk in chunks:
+        buf = np.concatenate([buf, chunk])
+        bits_high = buf >= HIGH_SIGNAL_THRESHOLD
+        while True:
+            if not synced:
+                # the next second must fit in the buffer to be checked
+                stop = len(buf) - SAMPLE_RATE + 1
+                if stop <= pos:
+                    break
+                for start in _find_frame_starts(bits_high, pos, stop):
+                    bits = decode_bits(buf[start:start+SAMPLE_RATE])[0]
+                    if np.all((bits == 2) == control_bits) and bits.min() >= 0:
+                        pos = start
+                        synced = True
+                        break
+                else:
+                    pos = max(pos, stop)
+                    break
+            nseconds = (len(buf) - pos) // SAMPLE_RATE
+            if not nseconds:
+                break
+            batch = decode_timeseries_batch(
+                buf[pos:pos+nseconds*SAMPLE_RATE])
+            invalid = np.flatnonzero(~batch['valid'])
+            nvalid = invalid[0] if len(invalid) else nseconds
+            for i in range(nvalid):
+                yield (int(offset + pos + i*SAMPLE_RATE),
+                       _decoded_second(batch, i))
+            pos += nvalid * SAMPLE_RATE
+            if nvalid == nseconds:
+                break
+            # lost sync; look for the next marker after the bad second starts
+            synced = False
+            pos += 1
+        # drop samples we are done with, but keep enough to look back at the
+        # bit before the next candidate for the start of a second
+        keep = max(pos - LAST_BIT_LENGTH, 0)
+        buf = buf[keep:]
+        offset += keep
+        pos -= keep
+
 def print_formatted_date(converted_date):
     # finally, print the date
     print(converted_date.strftime('%a %b %d %X %Y'))
 
-# and will cause a ValueError.
-def read_1_second_from_stdin():
-    # read in data from stdin; don't read more than a second worth of data
-    timeseries = np.zeros(SAMPLE_RATE)
-    line = ''
-    i = 0
-    while i < SAMPLE_RATE:
-        line = sys.stdin.readline()
-        if not line:
-            if i == 0:
-                raise EOFError('Hit EOF at end of a second.')
-            else:
-                raise ValueError('Hit EOF ' + str(i) + ' lines into second; '
-                                 'provide integer number of seconds of data.')
-        timeseries[i] = float(line)
-        i += 1
+def _rechunk(arrays, chunk_size):
+    """Take an iterable of 1D arrays of any length and yield arrays of exactly
+    ``chunk_size`` samples containing the same data (except for the last,
+    which will be shorter if the total length is not a multiple of
+    ``chunk_size``)."""
+    pending = []
+    num_pending = 0
+    for array in arrays:
+        pending.append(array)
+        num_pending += len(array)
+        while num_pending >= chunk_size:
+            joined = np.concatenate(pending)
+            yield joined[:chunk_size]
+            pending = [joined[chunk_size:]]
+            num_pending = len(pending[0])
+    if num_pending:
+        yield np.concatenate(pending)
+
+def _read_text_blocks(infile, blocksize=TEXT_BLOCK_SIZE):
+    """Parse whitespace-delimited floats from ``infile`` ``blocksize``
+    characters at a time, yielding an array of the values in each block.
+    Numbers split across the end of a block are carried over to the next."""
+    remainder = ''
+    while True:
+        block = infile.read(blocksize)
+        if not block:
+            break
+        values = (remainder + block).split()
+        remainder = '' if block[-1:].isspace() else values.pop()
+        yield np.array(values, dtype=float)
+    if remainder:
+        yield np.array([remainder], dtype=float)
+
+def _read_binary_blocks(infile, dtype, blocksize):
+    """Read raw ``dtype`` samples from ``infile`` ``blocksize`` samples at a
+    time, yielding an array for each block."""
+    dtype = np.dtype(dtype)
+    while True:
+        block = infile.read(blocksize * dtype.itemsize)
+        if not block:
+            break
+        if len(block) % dtype.itemsize:
+            raise ValueError('Input ends partway through a {} sample.'
+                             .format(dtype))
+        yield np.frombuffer(block, dtype=dtype)
+
+def read_timeseries_chunks(infile=None, fmt='text',
+                           chunk_size=CHUNK_SECONDS*SAMPLE_RATE):
+    """Read a timeseries from the file named ``infile`` (or from STDIN if it
+    is ``None``) in format ``fmt`` (one of ``INPUT_FORMATS``), yielding it as
+    1D arrays of ``chunk_size`` samples (the last chunk may be shorter). Text
+    is parsed in large blocks by numpy; raw binary from STDIN is read in
+    blocks with ``numpy.frombuffer``, while raw binary and ``npy`` files are
+    memory-mapped, so that chunks are views into the mapped file."""
+    if not fmt in INPUT_FORMATS:
+        raise ValueError("Unknown input format: {}".format(fmt))
+    if fmt == 'npy' or (fmt != 'text' and infile is not None):
+        if infile is None:
+            raise ValueError("npy format can only be read from a file.")
+        if fmt == 'npy':
+            data = np.load(infile, mmap_mode='r').ravel()
+        else:
+            data = np.memmap(infile, dtype=fmt, mode='r')
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start+chunk_size]
+        return
+    if infile is not None:
+        stream = open(infile)
+    elif fmt == 'text':
+        stream = sys.stdin
+    else:
+        # read bytes rather than text on python 3
+        stream = getattr(sys.stdin, 'buffer', sys.stdin)
+    try:
+        if fmt == 'text':
+            blocks = _read_text_blocks(stream)
+        else:
+            blocks = _read_binary_blocks(stream, fmt, chunk_size)
+        for chunk in _rechunk(blocks, chunk_size):
+            yield chunk
+    finally:
+        if infile is not None:
+            stream.close()
+
+def read_timeseries(infile=None, fmt='text', num_samples=None):
+    """Read a whole timeseries (or just its first ``num_samples`` samples)
+    from ``infile`` in format ``fmt``; see ``read_timeseries_chunks``. Raises
+    an ``EOFError`` if fewer than ``num_samples`` samples are available."""
+    chunk_size = num_samples or CHUNK_SECONDS*SAMPLE_RATE
+    chunks = []
+    for chunk in read_timeseries_chunks(infile, fmt, chunk_size):
+        chunks.append(chunk)
+        if num_samples is not None:
+            break
+    timeseries = np.concatenate(chunks) if chunks else np.zeros(0)
+    if num_samples is not None and len(timeseries) < num_samples:
+        raise EOFError('Hit EOF after {} of {} samples.'.format(
+            len(timeseries), num_samples))
     return timeseries
 
 def main():
-    while True:
-        try:
-            timeseries = read_1_second_from_stdin()
-            print_formatted_date(get_date_from_timeseries(timeseries))
-        except EOFError:
-            return
+    if args.stream:
+        chunks = read_timeseries_chunks(args.infile, args.format)
+        for offset, decoded in decode_stream(chunks):
+            sys.stdout.write('{}\t'.format(offset))
+            print_formatted_date(decoded['datetime'])
+        return
+    for chunk in read_timeseries_chunks(args.infile, args.format):
+        extra = len(chunk) % SAMPLE_RATE
+        decoded = decode_timeseries_batch(chunk[:len(chunk)-extra])
+        for i, converted_date in enumerate(decoded['datetime']):
+            if not decoded['valid'][i]:
+                # raise the same error as decoding this second on its own
+                decode_timeseries(chunk[i*SAMPLE_RATE:(i+1)*SAMPLE_RATE])
+            print_formatted_date(converted_date.astype(datetime))
+        if extra:
+            raise ValueError('Hit EOF ' + str(extra) + ' samples into '
+                             'second; provide integer number of seconds of '
+                             'data.')
 
 # run this if we are running from command line
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# (c) Stefan Countryman, 2018
+
+"""Check ``geco_irig_decode.decode_stream`` on a synthetic IRIG-B signal fed
+in tiny chunks and in inputs shorter than a second. Run directly or with
+``pytest``."""
+
+from datetime import datetime, timedelta
+import numpy as np
+import geco_irig_decode as gid
+
+START = datetime(2018, 12, 31, 23, 59, 58)
+# start this many samples into the first second so the input is unaligned
+LEAD = 3000
+# fraction of a bit that each type of bit (0, 1, or control) is high for
+HIGH_FRACTIONS = (0.2, 0.5, 0.8)
+
+
+def encode_second(t):
+    """Make one second of synthetic IRIG-B signal encoding the datetime
+    ``t``."""
+    bits = np.where(gid.control_bits, 2, 0)
+    day = (t - datetime(t.year, 1, 1)).days + 1
+    values = (t.second, t.minute, t.hour, day, t.year % 100)
+    # each field is BCD; the weight of a bit is 1, 2, 4 or 8 times a power
+    # of ten, which tells us which decimal digit it belongs to
+    for value, weights in zip(values, gid.FIELD_WEIGHTS.T):
+        for i in np.flatnonzero(weights):
+            power = 10**int(np.log10(weights[i]))
+            if (value // power) % 10 & (weights[i] // power):
+                bits[i] = 1
+    timeseries = np.zeros(gid.SAMPLE_RATE)
+    bit_length = float(gid.SAMPLE_RATE) / gid.BITS_PER_SECOND
+    for start, bit in zip(gid.BIT_STARTS.astype(int), bits):
+        high = int(HIGH_FRACTIONS[bit] * bit_length)
+        timeseries[start:start+high] = 2 * gid.HIGH_SIGNAL_THRESHOLD
+    return timeseries
+
+
+def make_signal(nseconds, start=START):
+    """Make ``nseconds`` of synthetic IRIG-B signal starting at ``start``."""
+    return np.concatenate([encode_second(start + timedelta(seconds=i))
+                           for i in range(nseconds)])
+
+
+def check_stream(chunks):
+    """Decode ``chunks`` and check that each second's sample offset matches
+    its decoded time, returning the ``(offset, decoded)`` results."""
+    results = list(gid.decode_stream(chunks))
+    for offset, decoded in results:
+        seconds = (offset + LEAD) // gid.SAMPLE_RATE
+        assert (offset + LEAD) % gid.SAMPLE_RATE == 0
+        assert decoded['datetime'] == START + timedelta(seconds=seconds)
+    return results
+
+
+def test_aligned_input():
+    signal = make_signal(3)
+    decoded = gid.decode_timeseries_batch(signal)
+    assert decoded['valid'].all()
+    assert gid.decode_timeseries(signal)['datetime'] == START
+
+
+def test_sub_second_input():
+    signal = make_signal(2)[LEAD:]
+    assert check_stream([signal[:16000]]) == []
+    assert check_stream([signal[:gid.SAMPLE_RATE // 2]]) == []
+    assert check_stream([signal[:100]]) == []
+    assert check_stream([]) == []
+
+
+def test_tiny_chunks():
+    signal = make_signal(5)[LEAD:]
+    for size in (777, 1000, 4096):
+        chunks = [signal[i:i+size] for i in range(0, len(signal), size)]
+        assert len(check_stream(chunks)) == 4
+
+
+def test_single_sample_chunks():
+    signal = make_signal(3)[LEAD:]
+    assert len(check_stream([signal[i:i+1] for i in range(len(signal))])) == 2
+
+
+def test_resync_after_glitch():
+    signal = make_signal(6)
+    # corrupt a bit in the third second
+    signal[2*gid.SAMPLE_RATE + gid.ALL_TEST_POINT_INDICES[30, 3]] = \
+        2 * gid.HIGH_SIGNAL_THRESHOLD
+    results = check_stream(np.array_split(signal[LEAD:], 37))
+    offsets = [offset + LEAD for offset, decoded in results]
+    assert offsets == [s * gid.SAMPLE_RATE for s in (1, 3, 4, 5)]
+
+
+if __name__ == "__main__":
+    for name, func in sorted(globals().items()):
+        if name.startswith('test_'):
+            func()
+            print('{} passed'.format(name))
@@ -2,8 +2,11 @@
 # (c) Stefan Countryman, 2016-2017
 
 DESC="""Plot an IRIG-B signal read from stdin. Assumes that the timeseries
-is a sequence of newline-delimited float literals."""
+is a sequence of newline-delimited float literals unless another --format is
+given."""
 FAST_CHANNEL_BITRATE = 16384  # for IRIG-B, DuoTone, etc.
+# same as geco_irig_decode.INPUT_FORMATS; "npy" only works with --infile.
+INPUT_FORMATS = ('text', 'float32', 'float64', 'int16', 'npy')
 
 # THE REST OF THE IMPORTS ARE AFTER THIS IF STATEMENT.
 # Quits immediately on --help or -h flags to skip slow imports when you just
@@ -23,6 +26,16 @@ if __name__ == "__main__":
     parser.add_argument("-A", "--actualtime",
                         help=("actual time signal was recorded "
                               "(appears in title)"))
+    parser.add_argument("-i", "--infile",
+                        help=("read the signal from this file instead of "
+                              "stdin; raw binary and .npy files are "
+                              "memory-mapped"))
+    parser.add_argument("-f", "--format", choices=INPUT_FORMATS,
+                        default='text',
+                        help=("format of the input: text, raw native-endian "
+                              "binary samples of the given type, or a .npy "
+                              "file saved with numpy.save. DEFAULT: "
+                              "%(default)s"))
     args = parser.parse_args()
 
 # Force matplotlib to not use any Xwindows backend. NECESSARY ON CLUSTER.
@@ -34,19 +47,24 @@ import numpy as np
 import matplotlib.pyplot as plt
 import geco_irig_decode
 
-def read_timeseries_stdin(num_lines, cat_to_stdout=False):
-    """Read in newline-delimited numerical data from stdin; don't read more
-    than a second worth of data. If cat_to_stdout is True, print data that
-    has been read in back to stdout (useful for piped commands)."""
-    timeseries = np.zeros(num_lines)
-    line = ""
-    i = 0
-    while i < num_lines:
-        line = float(sys.stdin.readline())
-        timeseries[i] = line
-        if cat_to_stdout:
-            print(line)
-        i += 1
+def read_timeseries_stdin(num_lines, cat_to_stdout=False, fmt='text',
+                          infile=None):
+    """Read in newline-delimited numerical data from stdin (or data in another
+    of ``geco_irig_decode.INPUT_FORMATS``, optionally from ``infile``); don't
+    read more than ``num_lines`` samples. If cat_to_stdout is True, print
+    data that has been read in back to stdout in the same format (useful for
+    piped commands)."""
+    timeseries = geco_irig_decode.read_timeseries(infile, fmt, num_lines)
+    if cat_to_stdout:
+        if fmt == 'text':
+            print('\n'.join(str(value) for value in timeseries.tolist()))
+        else:
+            stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+            if fmt == 'npy':
+                np.save(stdout, timeseries)
+            else:
+                stdout.write(np.asarray(timeseries).tobytes())
+            stdout.flush()
     return timeseries
 
 def irigb_decoded_title(timeseries, IFO=None, actual_time=None):
@@ -131,7 +149,8 @@ def plot_with_zoomed_views(timeseries, title, num_subdivs=5, dt=1.,
 
 if __name__ == '__main__':
     timeseries = read_timeseries_stdin(FAST_CHANNEL_BITRATE,
-                                       cat_to_stdout=args.timeseries)
+                                       cat_to_stdout=args.timeseries,
+                                       fmt=args.format, infile=args.infile)
     title = irigb_decoded_title(timeseries, args.detector, args.actualtime)
     output_filename = irigb_output_filename(args.outfile)
     plot_with_zoomed_views(timeseries, title, num_subdivs=5, dt=1.,
@@ -3,24 +3,53 @@
 # pylint: disable=superfluous-parens
 
 """
-USAGE: geco_irigb_midnight_bug_check.py START END
-
 Check +/- 30 seconds around midnight in the given date range. START and END
 should both be something like 2018-10-03. All dates between these two dates
 (endpoints inclusive) will be checked at 00:00:00 (the start of each date).
+
+Times are allowed to be off by the current number of leap seconds. This most
+likely indicates that the device producing the IRIG-B signal is outputting GPS
+time. Several days are fetched at once (all channels for a day are fetched
+together), and every second of each fetched window is decoded at once. Results
+are written as CSV rows as soon as each day has been checked (in no particular
+order), one row per channel and second; by default, only seconds with the wrong
+time (scale ERROR) or that could not be decoded (scale BAD) are written.
 """
 
+JOBS = 4
+TIMEWINDOW = 30
+COLUMNS = ('channel', 'gps_actual', 'gps_decoded', 'leap', 'scale', 'second',
+           'minute', 'hour', 'day', 'year', 'datetime_decoded',
+           'datetime_actual')
+
 import sys
 
 # spit out help string before slow imports if necessary
-if __name__ == "__main__" and {"-h", "--help"}.intersection(sys.argv):
-    print(__doc__)
-    exit(0)
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("start", help="the first date to check")
+    parser.add_argument("end", help="the last date to check")
+    parser.add_argument("-j", "--jobs", type=int, default=JOBS,
+                        help=("number of days to fetch and check at once. "
+                              "DEFAULT: %(default)s"))
+    parser.add_argument("-w", "--window", type=int, default=TIMEWINDOW,
+                        help=("number of seconds before and after midnight "
+                              "to check. DEFAULT: %(default)s"))
+    parser.add_argument("-o", "--outfile",
+                        help="write the CSV table here. DEFAULT: STDOUT")
+    parser.add_argument("-a", "--all", action="store_true",
+                        help=("write a row for every second checked, not "
+                              "just the mismatches"))
+    args = parser.parse_args()
 
 # pylint: disable=wrong-import-position
+import csv
 from datetime import timedelta
+from multiprocessing.pool import ThreadPool
+import numpy as np
 from astropy.time import Time
-from gwpy.timeseries import TimeSeries
+from gwpy.timeseries import TimeSeries, TimeSeriesDict
 from dateutil.parser import parse as parse_datetime
 import geco_irig_decode
 
@@ -32,84 +61,138 @@ ARMS = ['X', 'Y']
 CHANS = ['{}:CAL-PCAL{}_IRIGB_OUT_DQ'.format(ifo, arm)
          for ifo in IFOS for arm in ARMS]
 TFORMAT = '%a %b %d %X %Y'
+GPS_EPOCH = np.datetime64('1980-01-06T00:00:00')
 
 
 def get_leap_seconds(gps):
-    """Find the number of leap seconds at a given gps time using astropy's time
-    module (by comparing UTC to TAI and subtracting 19, the base difference
-    between TAI and GPS scales)."""
+    """Find the number of leap seconds at a given gps time (or array of gps
+    times) using astropy's time module (by comparing UTC to TAI and
+    subtracting 19, the base difference between TAI and GPS scales)."""
     t = Time(gps, format='gps')
-    t.format = 'iso'
-    return (t.tai.to_datetime() - t.utc.to_datetime()).seconds - 19
-
-
-def check_decoded_times(start_time, timewindow=30):
-    """Check the decoded IRIG-B times within a window of size timewindow
-    surrounding the event time and make sure the times are all correct (i.e.
-    they are either the correct UTC or GPS time; either one is considered
-    correct). Save the results of the check to a text file for upload to LIGO's
-    EVNT log."""
-    for chan in CHANS:
-        format_string = 'Decoding {}+/-{}s on channel {}.'
-        start_time = int(start_time)
-        msg = format_string.format(start_time, timewindow, chan)
-        print(msg)
-        # print a header, since output will be arranged tabularly, e.g.
-        # 1225152018 | 1225152018 |   18 | GPS   |   0 |   0 |  0 | 306 | ...
-        # 2018 | Thu Nov 02 00:00:00 2018 | Fri Nov 02 23:59:42 2018
-        print("Actual GPS | Decode GPS | Leap | Scale | Sec | Min | Hr | Day "
-              "| Year | Decoded Date/Time        | Actual UTC Date/Time")
-        print("-----------+------------+------+-------+-----+-----+----+-----"
-              "+------+--------------------------+-------------------------")
-        row_fmt = ("{gps_actual:>10d} | {gps_decoded:>10d} | {leap:>4d} | "
-                   "{scale:<5} | {second:>3d} | {minute:>3d} | {hour:>2d} | "
-                   "{day:>3d} | {year:>4d} | {datetime_decoded:<24} | "
-                   "{datetime_actual:<24}")
-        timeseries = TimeSeries.fetch(chan, start_time-timewindow,
-                                      start_time+timewindow+1).value
-        # deal with one second at a time, writing results to file
-        for i in range(2*timewindow + 1):
-            timeseries_slice = timeseries[i*BITRATE:(i+1)*BITRATE]
-            gps_actual = (start_time - timewindow) + i
-            leap_seconds = get_leap_seconds(gps_actual)
-            t_actual = Time(gps_actual, format='gps', scale='utc')
-            decoded = geco_irig_decode.decode_timeseries(timeseries_slice)
-            t = decoded['datetime']
-            dt = (t - t_actual.to_datetime()).seconds
-            datetime_actual = t_actual.to_datetime().strftime(TFORMAT)
-            # check whether the times agree, or whether they are off by the
-            # current number of leap seconds
-            if dt == 0:
-                scale = "UTC"
-            elif dt == leap_seconds:
-                scale = "GPS"
-            else:
-                scale = "ERROR"
-            print(row_fmt.format(gps_actual=gps_actual,
-            # foo = dict(gps_actual=gps_actual,
-                                 gps_decoded=int(Time(t).gps),
-                                 leap=leap_seconds, scale=scale,
-                                 datetime_decoded=t.strftime(TFORMAT),
-                                 datetime_actual=datetime_actual,
-                                 **decoded))
-            # print(foo)
+    tai_minus_utc = (t.tai.jd1 - t.utc.jd1) + (t.tai.jd2 - t.utc.jd2)
+    return np.round(tai_minus_utc * 86400).astype(int) - 19
+
+
+def _format_datetimes(datetimes):
+    """Format a ``numpy.datetime64`` array with ``TFORMAT``."""
+    return [t.strftime(TFORMAT) for t in datetimes.astype('datetime64[s]')
+            .astype(object)]
+
+
+def fetch_window(start_time, timewindow=TIMEWINDOW, chans=CHANS):
+    """Fetch the IRIG-B signal from each of ``chans`` within ``timewindow``
+    seconds of ``start_time``, all at once if possible, returning a
+    dictionary mapping channel names to sample arrays. Channels that cannot
+    be fetched on their own are left out."""
+    start, end = start_time-timewindow, start_time+timewindow+1
+    try:
+        bufs = TimeSeriesDict.fetch(chans, start, end)
+    except RuntimeError:
+        bufs = dict()
+        for chan in chans:
+            try:
+                bufs[chan] = TimeSeries.fetch(chan, start, end)
+            except RuntimeError:
+                sys.stderr.write('Could not fetch {} at {}.\n'.format(
+                    chan, start_time))
+    return dict((chan, buf.value) for chan, buf in bufs.items())
+
+
+def check_timeseries(timeseries, chan, start_time, timewindow=TIMEWINDOW):
+    """Check the decoded IRIG-B times in ``timeseries`` (from ``chan``)
+    within a window of size timewindow surrounding ``start_time`` and make
+    sure the times are all correct (i.e. they are either the correct UTC or
+    GPS time; either one is considered correct). Returns a list of
+    dictionaries with ``COLUMNS`` as keys, one for each second."""
+    batch = geco_irig_decode.decode_timeseries_batch(timeseries)
+    valid = batch['valid']
+    gps_actual = np.arange(len(valid)) + (start_time - timewindow)
+    leap = get_leap_seconds(gps_actual)
+    t_actual = GPS_EPOCH + (gps_actual - leap).astype('timedelta64[s]')
+    # check whether the times agree, or whether they are off by the current
+    # number of leap seconds
+    dt = (batch['datetime'] - t_actual).astype(int)
+    scale = np.where(dt == 0, 'UTC', np.where(dt == leap, 'GPS', 'ERROR'))
+    scale[~valid] = 'BAD'
+    gps_decoded = np.zeros(len(valid), dtype=int)
+    if valid.any():
+        isot = np.datetime_as_string(batch['datetime'][valid])
+        gps_decoded[valid] = np.round(Time(list(isot), format='isot',
+                                           scale='utc').gps).astype(int)
+    datetime_decoded = dict(zip(np.flatnonzero(valid),
+                                _format_datetimes(batch['datetime'][valid])))
+    datetime_actual = _format_datetimes(t_actual)
+    rows = []
+    for i in range(len(valid)):
+        row = dict(channel=chan, gps_actual=int(gps_actual[i]),
+                   leap=int(leap[i]), scale=str(scale[i]),
+                   datetime_actual=datetime_actual[i])
+        if valid[i]:
+            row['gps_decoded'] = int(gps_decoded[i])
+            row['datetime_decoded'] = datetime_decoded[i]
+            for field in geco_irig_decode.FIELDS:
+                row[field] = int(batch[field][i])
+        rows.append(row)
+    return rows
+
+
+def check_decoded_times(start_time, timewindow=TIMEWINDOW):
+    """Check the decoded IRIG-B times on all ``CHANS`` within a window of
+    size timewindow surrounding the event time (see ``check_timeseries``),
+    fetching all channels at once. Returns a list of result rows."""
+    start_time = int(start_time)
+    rows = []
+    for chan, timeseries in sorted(fetch_window(start_time,
+                                                timewindow).items()):
+        rows += check_timeseries(timeseries, chan, start_time, timewindow)
+    return rows
+
+
+def _check_day(arguments):
+    """Check a day in a worker thread, returning the day and either the rows
+    or the exception that was raised."""
+    day, timewindow = arguments
+    try:
+        return day, check_decoded_times(Time(day).gps, timewindow)
+    except Exception as e:  # pylint: disable=broad-except
+        return day, e
 
 
 def main():
     """Check the specified date range; see module docstring."""
-    start = parse_datetime(sys.argv[1]).replace(hour=0, minute=0, second=0)
-    end = parse_datetime(sys.argv[2]).replace(hour=0, minute=0, second=0)
+    start = parse_datetime(args.start).replace(hour=0, minute=0, second=0)
+    end = parse_datetime(args.end).replace(hour=0, minute=0, second=0)
     days = (end - start).days + 1
-    print('Processing {} days between {} and {}.'.format(days, start, end))
-    print('Times are allowed to be off by current number of leap')
-    print('seconds. This most likely indicates that the device')
-    print('producing the IRIG-B signal is outputting GPS time.')
     if days < 1:
-        sys.stderr.write("end day cannot be earlier than start day.")
+        sys.stderr.write("end day cannot be earlier than start day.\n")
+        exit(1)
+    sys.stderr.write('Processing {} days between {} and {}.\n'.format(
+        days, start, end))
+    outfile = sys.stdout if args.outfile is None else open(args.outfile, 'w')
+    writer = csv.DictWriter(outfile, COLUMNS, lineterminator='\n')
+    writer.writeheader()
+    failed = 0
+    pool = ThreadPool(args.jobs)
+    try:
+        dates = [(start + timedelta(d), args.window) for d in range(days)]
+        for day, rows in pool.imap_unordered(_check_day, dates):
+            if isinstance(rows, Exception):
+                failed += 1
+                sys.stderr.write("{}FAILED TO CHECK {}: {}{}\n".format(
+                    RED, day.date().isoformat(), rows, CLEAR))
+                continue
+            bad = [r for r in rows if r['scale'] in ('ERROR', 'BAD')]
+            sys.stderr.write("CHECKED DATE: {} ({} bad seconds)\n".format(
+                day.date().isoformat(), len(bad)))
+            writer.writerows(rows if args.all else bad)
+            outfile.flush()
+    finally:
+        pool.close()
+        pool.join()
+        if outfile is not sys.stdout:
+            outfile.close()
+    if failed:
         exit(1)
-    for day in (start + timedelta(d) for d in range(days)):
-        print("CHECKING DATE: {}".format(day.isoformat()))
-        check_decoded_times(Time(day).gps)
 
 
 if __name__ == "__main__":
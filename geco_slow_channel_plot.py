@@ -947,12 +947,17 @@ class TrendDataPlotter(Plotter):
                 grp = f.create_group(ch)
                 for field in stats[ch]._fields:
                     grp.create_dataset(field, data=getattr(stats[ch], field))
-    def load_stats(self):
+    def load_stats(self, fname=None):
         """Try loading cached ``CombinedPlotter.Stats`` from file for this
-        Plotter. If the file does not exist, an IOError will be raised."""
-        with h5py.File(self.fname_stats, 'r') as f:
+        Plotter. If the file does not exist, an IOError will be raised.
+        Optionally, load from ``fname`` instead of ``self.fname_stats``."""
+        if fname is None:
+            fname = self.fname_stats
+        with h5py.File(fname, 'r') as f:
             stats = dict()
             for q in self.queries:
+                if not q.channel in f:
+                    raise IOError('Channel missing from cached Stats file.')
                 if not set(f[q.channel].keys()) == set(self.Stats._fields):
                     raise IOError('Missing fields from cached Stats file.')
                 stat_dict = dict()
@@ -985,6 +990,15 @@ class TrendDataPlotter(Plotter):
             return self.load_stats()
         except IOError:
             pass
+        # statistics might have been accumulated while downloading the data
+        # (see the ``segment_stats`` jobspec option in geco_gwpy_dump)
+        try:
+            stats = self.load_stats(
+                self.job.segment_stats_filename(self.dq_flag))
+            self.save_stats(stats)
+            return stats
+        except IOError:
+            pass
         ts = self.read()
         stats = dict()
         for q in self.queries:
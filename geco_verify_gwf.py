@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+# (c) Stefan Countryman, 2018
+
+DESC = """Check the structure of GWF frame files without contacting the
+server they were downloaded from. Each file is memory-mapped and its file
+header, the length of every structure, the FrEndOfFile structure, and the
+table of contents it points to are checked for consistency; only the
+structure headers are read, so this is much faster than hashing. The file
+checksum (CRC) is checked as well, which requires reading the whole file; skip
+it with ``--no-crc`` for a much faster structural check. Files that pass
+without a CRC being checked (because they don't have one) are counted
+separately.
+Files are checked in parallel. Prints one line for each corrupt file and
+exits with a nonzero status if any were found. A fast, local alternative to
+``geco_fetch_frame_files_find_corrupt``."""
+VERBOSE = False
+# frame format versions this script knows how to walk
+SUPPORTED_VERSIONS = (6, 7, 8)
+_BLUE = '\033[94m'
+_CLEAR = '\033[0m'
+_COMPLAINT = "{}---[{{}}]---{}\n{{}}\n".format(_BLUE, _CLEAR)
+
+# all other imports listed after argument parsing, allowing for fast help
+# documentation printing.
+import sys
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description=DESC)
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=["."],
+        help="""
+            GWF files to check, or directories to search (recursively) for
+            GWF files. DEFAULT: the current directory
+        """
+    )
+    parser.add_argument(
+        "-n",
+        "--no-crc",
+        dest="crc",
+        action="store_false",
+        help="""
+            Don't check the file checksum stored in each FrEndOfFile structure
+            (for files that have one). Checking it reads every byte of every
+            file, using the POSIX ``cksum`` utility to calculate the CRC.
+        """
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help="""
+            The number of files to check at once. DEFAULT: the number of
+            CPUs.
+        """
+    )
+    parser.add_argument(
+        "-a",
+        "--all",
+        action="store_true",
+        help="Print a line for every file checked, not just corrupt ones."
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Print diagnostic information to STDERR."
+    )
+    args = parser.parse_args()
+    VERBOSE = args.verbose
+
+import os
+import mmap
+import struct
+import multiprocessing
+from datetime import datetime
+from subprocess import Popen, PIPE
+
+
+class GWFStructureError(Exception):
+    """An error thrown when a GWF file is not structured as expected."""
+
+
+def complain(*messages):
+    """Write a message to stderr if the ``--verbose`` flag is set. Otherwise,
+    throw away the message. If multiple messages are provided, join them with
+    newlines."""
+    msg = '\n'.join([format(m) for m in messages])
+    if VERBOSE:
+        formatted_message = _COMPLAINT.format(datetime.now().isoformat(), msg)
+        sys.stderr.write(formatted_message)
+
+
+class GWFFile(object):
+    """A memory-mapped GWF file, with methods for checking its structure
+    (following the frame format specification, LIGO-T970130, for versions
+    listed in ``SUPPORTED_VERSIONS``).
+
+    Every structure in a GWF file starts with a common header giving its
+    length, class and instance, so the file can be walked from structure to
+    structure by reading only those headers. Structure classes are defined
+    by FrSH structures in the file itself, which is how the FrEndOfFile and
+    FrTOC structures are recognized."""
+
+    ORIGINATOR = b'IGWD\0'
+    FILE_HEADER_LENGTH = 40
+    # sizes of INT_2, INT_4, INT_8, REAL_4 and REAL_8
+    TYPE_SIZES = (2, 4, 8, 4, 8)
+    # byte order markers, packed in the file's byte order
+    _MARKERS_FMT = 'HIQfd'
+    _MARKERS = (0x1234, 0x12345678, 0x0123456789abcdef)
+    # structure length, checksum type, class, instance; versions before 8
+    # have a 2-byte class and no checksum type
+    _COMMON_HEADER_FMTS = {
+        8: 'QBBI',
+        7: 'QHI',
+        6: 'QHI'
+    }
+    COMMON_HEADER_LENGTH = 14
+    _FRSH_CLASS = 1
+    # FrEndOfFile contents after the common header
+    _END_OF_FILE_FMTS = {
+        # nFrames, nBytes, seekTOC, chkSumFrHeader, chkSum, chkSumFile
+        8: 'IQQIII',
+        # nFrames, nBytes, chkType, chkSum, seekTOC
+        7: 'IQIIQ',
+        6: 'IQIIQ'
+    }
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.size = os.path.getsize(filename)
+        self.byteorder = None
+        self.version = None
+        self.classes = dict()
+        self.end_of_file = None
+        self.end_of_file_offset = None
+        self.toc_offset = None
+
+    def _unpack(self, data, fmt, offset):
+        fmt = self.byteorder + fmt
+        end = offset + struct.calcsize(fmt)
+        if end > len(data):
+            raise GWFStructureError("Truncated at byte {} of {}.".format(
+                len(data), end))
+        return struct.unpack(fmt, data[offset:end])
+
+    def _string(self, data, offset):
+        """Read a GWF ``STRING`` (a length, including the trailing null,
+        followed by the characters) at ``offset``, returning the decoded
+        string and the offset just past it."""
+        length, = self._unpack(data, 'H', offset)
+        start = offset + 2
+        value = data[start:start+length].rstrip(b'\0').decode('ascii',
+                                                              'replace')
+        return value, start + length
+
+    def check_file_header(self, data):
+        """Check the originator, version, type sizes and byte order markers
+        in the 40-byte file header, setting ``self.byteorder`` and
+        ``self.version``."""
+        if self.size < self.FILE_HEADER_LENGTH:
+            raise GWFStructureError("Too short for a file header.")
+        if data[:5] != self.ORIGINATOR:
+            raise GWFStructureError("Missing IGWD originator string.")
+        self.version = bytearray(data[5:6])[0]
+        if not self.version in SUPPORTED_VERSIONS:
+            raise GWFStructureError("Unsupported frame format version {}."
+                                    .format(self.version))
+        if tuple(bytearray(data[7:12])) != self.TYPE_SIZES:
+            raise GWFStructureError("Unexpected type sizes {}.".format(
+                tuple(bytearray(data[7:12]))))
+        # the INT_2 marker tells us the byte order; the rest must agree
+        for byteorder in '<>':
+            self.byteorder = byteorder
+            markers = self._unpack(data, self._MARKERS_FMT, 12)
+            if markers[0] == self._MARKERS[0]:
+                break
+        else:
+            raise GWFStructureError("Bad INT_2 byte order marker.")
+        if markers[1:3] != self._MARKERS[1:3]:
+            raise GWFStructureError("Bad INT_4/INT_8 byte order markers.")
+        if (abs(markers[3] - 3.1415927) > 1e-6 or
+                abs(markers[4] - 3.141592653589793) > 1e-15):
+            raise GWFStructureError("Bad REAL_4/REAL_8 byte order markers.")
+
+    def walk(self, data):
+        """Walk the structures after the file header by their lengths,
+        recording the classes defined by FrSH structures and the offset of
+        the FrTOC structure, and parsing the final FrEndOfFile structure into
+        ``self.end_of_file``. Checks that every structure lies within the
+        file and that the last one is an FrEndOfFile."""
+        offset = self.FILE_HEADER_LENGTH
+        last = None
+        while offset < self.size:
+            header = self._unpack(data, self._COMMON_HEADER_FMTS[self.version],
+                                  offset)
+            length, cls = header[0], header[-2]
+            if length < self.COMMON_HEADER_LENGTH:
+                raise GWFStructureError("Structure at byte {} has bad length "
+                                        "{}.".format(offset, length))
+            if offset + length > self.size:
+                raise GWFStructureError("Structure at byte {} runs past end "
+                                        "of file.".format(offset))
+            if cls == self._FRSH_CLASS:
+                name, pos = self._string(data,
+                                         offset + self.COMMON_HEADER_LENGTH)
+                defined, = self._unpack(data, 'H', pos)
+                self.classes[name] = defined
+            if cls == self.classes.get('FrTOC'):
+                self.toc_offset = offset
+            last = (offset, cls)
+            offset += length
+        if last is None or last[1] != self.classes.get('FrEndOfFile'):
+            raise GWFStructureError("Last structure is not an FrEndOfFile.")
+        fmt = self._END_OF_FILE_FMTS[self.version]
+        values = self._unpack(data, fmt, last[0] + self.COMMON_HEADER_LENGTH)
+        if self.version >= 8:
+            keys = ('nFrames', 'nBytes', 'seekTOC', 'chkSumFrHeader',
+                    'chkSum', 'chkSumFile')
+        else:
+            keys = ('nFrames', 'nBytes', 'chkType', 'chkSum', 'seekTOC')
+        self.end_of_file = dict(zip(keys, values))
+        self.end_of_file_offset = last[0]
+
+    def check_end_of_file(self):
+        """Check that the FrEndOfFile structure agrees with the file size and
+        points back to the FrTOC structure (if it says there is one)."""
+        eof = self.end_of_file
+        if eof['nBytes'] != self.size:
+            raise GWFStructureError("FrEndOfFile says file is {} bytes, but "
+                                    "it is {}.".format(eof['nBytes'],
+                                                       self.size))
+        if eof['seekTOC'] and self.size - eof['seekTOC'] != self.toc_offset:
+            raise GWFStructureError("FrEndOfFile seekTOC does not point to "
+                                    "the FrTOC.")
+
+    def check_crc(self, data):
+        """Check the file checksum stored in the FrEndOfFile, which is a POSIX
+        ``cksum`` CRC of all of the bytes preceding it in the file: the
+        ``chkSumFile`` field in version 8 and later (absent if it is zero),
+        or the ``chkSum`` field before that (absent unless ``chkType`` is
+        1). Returns ``False`` if the file has no CRC to check, otherwise
+        ``True``."""
+        eof = self.end_of_file
+        if self.version >= 8:
+            expected = eof['chkSumFile']
+            end = self.size - 4
+        else:
+            expected = eof['chkSum'] if eof['chkType'] == 1 else 0
+            end = (self.end_of_file_offset + self.COMMON_HEADER_LENGTH +
+                   struct.calcsize(self.byteorder + 'IQI'))
+        if not expected:
+            complain("No file CRC to check in", self.filename)
+            return False
+        proc = Popen(['cksum'], stdin=PIPE, stdout=PIPE)
+        # feed the mapped file in slices so it never has to be copied whole
+        for start in range(0, end, 2**24):
+            proc.stdin.write(data[start:min(start + 2**24, end)])
+        res, err = proc.communicate()
+        crc = int(res.split()[0])
+        if crc != expected:
+            raise GWFStructureError("File CRC {} does not match {} in "
+                                    "FrEndOfFile.".format(crc, expected))
+        return True
+
+    def check(self, crc=True):
+        """Run all checks, raising a ``GWFStructureError`` describing the
+        first problem found. Returns whether the file CRC was checked (see
+        ``check_crc``)."""
+        if self.size == 0:
+            raise GWFStructureError("File is empty.")
+        with open(self.filename, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                self.check_file_header(data)
+                self.walk(data)
+                self.check_end_of_file()
+                return crc and self.check_crc(data)
+            finally:
+                data.close()
+
+
+def check_file(filename, crc=True):
+    """Check ``filename``, returning a tuple of the filename, a description
+    of the problem with it (or ``None`` if it looks intact), and whether its
+    CRC was checked. Defined at the module level so that it can be used with
+    ``multiprocessing``."""
+    complain("Checking", filename)
+    try:
+        crc_checked = GWFFile(filename).check(crc)
+    except GWFStructureError as e:
+        return (filename, e.args[0], False)
+    except (IOError, OSError) as e:
+        return (filename, "Could not read file: {}".format(e), False)
+    return (filename, None, crc_checked)
+
+
+def _check_file_star(arguments):
+    return check_file(*arguments)
+
+
+def find_gwf_files(paths):
+    """Get a sorted list of the GWF files in ``paths``, searching directories
+    recursively."""
+    found = list()
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                found += [os.path.join(dirpath, f) for f in filenames
+                          if f.endswith('.gwf')]
+        else:
+            found.append(path)
+    return sorted(found)
+
+
+def check_files(filenames, crc=True, jobs=None):
+    """Check ``filenames`` in parallel using ``jobs`` processes (defaulting
+    to the number of CPUs), yielding ``(filename, problem, crc_checked)``
+    tuples (see ``check_file``) in the order the checks finish."""
+    pool = multiprocessing.Pool(jobs)
+    try:
+        for result in pool.imap_unordered(_check_file_star,
+                                          [(f, crc) for f in filenames]):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main():
+    filenames = find_gwf_files(args.paths)
+    complain("Checking {} files.".format(len(filenames)))
+    corrupt = 0
+    no_crc = 0
+    for filename, problem, crc_checked in check_files(filenames, args.crc,
+                                                      args.jobs):
+        if problem is not None:
+            corrupt += 1
+            print('corrupt file:\t{}\t{}'.format(filename, problem))
+            continue
+        if not crc_checked:
+            no_crc += 1
+        if args.all:
+            print('{}:\t{}'.format('ok' if crc_checked else
+                                   'ok (no file CRC checked)', filename))
+    if args.crc and no_crc:
+        sys.stderr.write("{} of {} intact files had no file CRC checked.\n"
+                         .format(no_crc, len(filenames) - corrupt))
+    complain("{} of {} files corrupt.".format(corrupt, len(filenames)))
+    if corrupt:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
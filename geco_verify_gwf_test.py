@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# (c) Stefan Countryman, 2018
+
+"""Check ``geco_verify_gwf`` on minimal synthetic GWF files of each supported
+frame format version. Run directly or with ``pytest``."""
+
+import os
+import struct
+import shutil
+import tempfile
+from subprocess import Popen, PIPE
+import geco_verify_gwf as gvg
+
+# class numbers given to the structures by the FrSH structures in each file
+FRSH, DATA, TOC, END_OF_FILE = 1, 3, 4, 5
+
+
+def cksum(data):
+    """Get the POSIX ``cksum`` CRC of ``data``."""
+    proc = Popen(['cksum'], stdin=PIPE, stdout=PIPE)
+    res, _ = proc.communicate(data)
+    return int(res.split()[0])
+
+
+def gwf_string(value):
+    """Pack a GWF ``STRING``."""
+    value = value.encode('ascii') + b'\0'
+    return struct.pack('<H', len(value)) + value
+
+
+def structure(version, cls, instance, payload):
+    """Pack a structure with a common header for frame format ``version``."""
+    if version >= 8:
+        # checksum type, class, and a (zero) structure checksum at the end
+        return (struct.pack('<QBBI', 14 + len(payload) + 4, 0, cls,
+                            instance) + payload + b'\0' * 4)
+    return struct.pack('<QHI', 14 + len(payload), cls, instance) + payload
+
+
+def make_gwf(version, crc=True):
+    """Make the bytes of a minimal GWF file for frame format ``version``
+    holding a few FrSH structures, some data, an FrTOC and an FrEndOfFile,
+    with a file CRC in the FrEndOfFile if ``crc`` is true."""
+    data = (b'IGWD\0' + struct.pack('<BB', version, 0) +
+            struct.pack('<BBBBB', 2, 4, 8, 4, 8) +
+            struct.pack('<HIQfd', 0x1234, 0x12345678, 0x0123456789abcdef,
+                        3.1415927, 3.141592653589793) + b'\0\0')
+    assert len(data) == gvg.GWFFile.FILE_HEADER_LENGTH
+    for instance, (name, cls) in enumerate([('FrSH', FRSH), ('FrData', DATA),
+                                            ('FrTOC', TOC),
+                                            ('FrEndOfFile', END_OF_FILE)]):
+        data += structure(version, FRSH, instance,
+                          gwf_string(name) + struct.pack('<H', cls) +
+                          gwf_string('comment'))
+    data += structure(version, DATA, 0, b'x' * 5000)
+    toc_offset = len(data)
+    data += structure(version, TOC, 0, b'toc' * 10)
+    if version >= 8:
+        eof_length = 14 + struct.calcsize('<IQQIII')
+        size = len(data) + eof_length
+        data += (struct.pack('<QBBI', eof_length, 0, END_OF_FILE, 0) +
+                 struct.pack('<IQQIII', 1, size, size - toc_offset, 0, 0, 0)
+                 [:-4])
+        return data + struct.pack('<I', cksum(data) if crc else 0)
+    eof_length = 14 + struct.calcsize('<IQIIQ')
+    size = len(data) + eof_length
+    data += (struct.pack('<QHI', eof_length, END_OF_FILE, 0) +
+             struct.pack('<IQI', 1, size, 1 if crc else 0))
+    return (data + struct.pack('<I', cksum(data) if crc else 0) +
+            struct.pack('<Q', size - toc_offset))
+
+
+def check_bytes(data, crc=True):
+    """Write ``data`` to a temporary GWF file and check it, returning the
+    ``(problem, crc_checked)`` results of ``check_file``."""
+    outdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(outdir, 'test.gwf')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return gvg.check_file(path, crc)[1:]
+    finally:
+        shutil.rmtree(outdir)
+
+
+def test_intact_files_pass_with_crc():
+    for version in gvg.SUPPORTED_VERSIONS:
+        assert check_bytes(make_gwf(version)) == (None, True)
+        assert check_bytes(make_gwf(version), crc=False) == (None, False)
+
+
+def test_structure_walk():
+    for version in gvg.SUPPORTED_VERSIONS:
+        data = make_gwf(version)
+        outdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(outdir, 'test.gwf')
+            with open(path, 'wb') as f:
+                f.write(data)
+            gwf = gvg.GWFFile(path)
+            gwf.check_file_header(data)
+            gwf.walk(data)
+        finally:
+            shutil.rmtree(outdir)
+        assert gwf.classes == {'FrSH': FRSH, 'FrData': DATA, 'FrTOC': TOC,
+                               'FrEndOfFile': END_OF_FILE}
+        assert gwf.end_of_file['nBytes'] == len(data)
+        assert gwf.toc_offset == len(data) - gwf.end_of_file['seekTOC']
+
+
+def test_missing_crc_is_reported():
+    for version in gvg.SUPPORTED_VERSIONS:
+        assert check_bytes(make_gwf(version, crc=False)) == (None, False)
+
+
+def test_corrupt_data_fails_crc():
+    for version in gvg.SUPPORTED_VERSIONS:
+        data = bytearray(make_gwf(version))
+        data[1000] ^= 0xff
+        problem, _ = check_bytes(bytes(data))
+        assert problem.startswith('File CRC')
+
+
+def test_bad_structure_length():
+    for version in gvg.SUPPORTED_VERSIONS:
+        data = bytearray(make_gwf(version))
+        # claim the first structure runs past the end of the file
+        data[40:48] = struct.pack('<Q', len(data))
+        problem, _ = check_bytes(bytes(data))
+        assert 'runs past end of file' in problem
+        problem, _ = check_bytes(make_gwf(version)[:-20])
+        assert problem is not None
+
+
+if __name__ == "__main__":
+    for name, func in sorted(globals().items()):
+        if name.startswith('test_'):
+            func()
+            print('{} passed'.format(name))
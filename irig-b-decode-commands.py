@@ -36,6 +36,7 @@ import geco_irig_plot
 import geco_irig_decode
 import gwpy.timeseries
 import astropy.time
+import datetime
 
 def get_leap_seconds(gps):
     """Find the number of leap seconds at a given gps time using astropy's
@@ -78,14 +79,20 @@ def check_decoded_times(start_time, graceid, DT=DT):
             print(msg[:-1])
             timeseries = gwpy.timeseries.TimeSeries.fetch(chan, start_time-DT,
                                                           start_time+DT+1).value
-            # deal with one second at a time, writing results to file
+            # decode every second at once, then write results to file one
+            # second at a time
+            batch = geco_irig_decode.decode_timeseries_batch(timeseries)
             for i in range(2*DT + 1):
-                timeseries_slice = timeseries[i*BITRATE:(i+1)*BITRATE]
                 gps_actual = (start_time - DT) + i
                 leap_seconds = get_leap_seconds(gps_actual)
                 t_actual = astropy.time.Time(gps_actual, format='gps',
                                              scale='utc')
-                t = geco_irig_decode.get_date_from_timeseries(timeseries_slice)
+                if not batch['valid'][i]:
+                    t_actual_str = t_actual.to_datetime().strftime(TFORMAT)
+                    f.write('COULD NOT DECODE! ')
+                    f.write('SHOULD BE {}\n'.format(t_actual_str))
+                    continue
+                t = batch['datetime'][i].astype(datetime.datetime)
                 dt = (t - t_actual.to_datetime()).seconds
                 # check whether the times agree, or whether they are off by the
                 # current number of leap seconds